@@ -1,53 +1,112 @@
+import json
 import os
+import subprocess
 import sys
-from project import Lexer, Regex, Parser, encode, Interpreter
-
-
-def runcompletelexer(lexer_file: str, input_file: str, output_file: str):
-    lexer = read_lexer(lexer_file)
-    input_word = read_word(input_file)
+from project import Lexer, Parser, encode, Interpreter, load_lexer, write_ast, batch
+
+
+def runcompletelexer(lexer_file: str, input_file: str, output_file: str, workers: int = 0,
+                     chunk_size: int = Lexer.CHUNK_SIZE, cache_size: int = 0):
+    """
+        @param workers - if not 0, the whole input is read and lexed by Lexer.parse_parallel on that many processes
+        @param chunk_size - characters lexed by each parse_parallel job
+        @param cache_size - if not 0, the lexer is a LazyDFA keeping at most that many states, built uncached
+    """
+    if cache_size:
+        with open(lexer_file, 'r') as spec:
+            lexer = Lexer.from_spec(spec.read(), lazy=True, cache_size=cache_size)
+    else:
+        lexer = read_lexer(lexer_file)
 
     # creates output file (and intermediate folders) if it doesn't exist
     if not os.path.exists(os.path.dirname(output_file)):
         os.makedirs(os.path.dirname(output_file))
 
+    # tokens are written as they are read; on error the output holds only the error message
     with open(output_file, 'w') as file:
         try:
-            for token, word in lexer.parse(input_word):
+            if workers:
+                with open(input_file, 'r') as source:
+                    tokens = lexer.parse_parallel(source.read(), workers, chunk_size)
+            else:
+                tokens = lexer.lex_file(input_file)
+
+            for token, word in tokens:
                 file.write('{} {}\n'.format(token, encode(word)))
         except Lexer.ParseException as err:
+            file.seek(0)
+            file.truncate()
             file.write(str(err))
 
 
-def runparser(input_file: str, output_file: str):
+def runparser(input_file: str, output_file: str, arena: bool = False):
+    """@param arena - parse into an Arena, printed through Arena.to_ast"""
     # creates output file (and intermediate folders) if it doesn't exist
     if not os.path.exists(os.path.dirname(output_file)):
         os.makedirs(os.path.dirname(output_file))
 
+    ast = Parser('lexer.txt').parse(input_file, arena)
     with open(output_file, 'w+') as file:
-        file.write(str(Parser('lexer.txt').parse(input_file)))
+        write_ast(ast.to_ast() if arena else ast, file)
 
 
-def read_lexer(file_name: str) -> Lexer:
-    def parse_lexer(text: str) -> Lexer:
-        dfas = []
-        for line in text.split(';\n'):
-            if not line:
-                continue
-            token, regex = line.split(' ', maxsplit=1)
-            dfa = Regex.parse(regex).to_nfa().to_dfa()
+def runprogram(input_file: str, output_file: str):
+    """writes the store printed by "python3 CompleteLexer.py <input_file>", or the error raised by the program"""
+    # creates output file (and intermediate folders) if it doesn't exist
+    if not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))
+
+    try:
+        result = str(Interpreter('lexer.txt').interpret(input_file))
+    except Exception as err:
+        result = '{}: {}'.format(type(err).__name__, err)
 
-            dfas.append((token, dfa))
+    with open(output_file, 'w') as file:
+        file.write(result)
 
-        return Lexer(dfas)
-    
-    with open(file_name, 'r') as file:
-        return parse_lexer(file.read())
 
+def runserver(input_file: str, output_file: str, timeout: float = 0.5):
+    """
+        writes the responses of "python3 -m project.server" to the request lines of input_file, without their
+        times, which change from run to run
+    """
+    # creates output file (and intermediate folders) if it doesn't exist
+    if not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))
 
-def read_word(file_name: str) -> str:
-    with open(file_name, 'r') as file:
-        return file.read()
+    with open(input_file, 'r') as requests:
+        server = subprocess.run([sys.executable, '-m', 'project.server', '--timeout', str(timeout)],
+                                stdin=requests, stdout=subprocess.PIPE, text=True)
+
+    with open(output_file, 'w') as file:
+        for line in server.stdout.splitlines():
+            response = json.loads(line)
+            response.pop('parse_time', None)
+            response.pop('run_time', None)
+            file.write(json.dumps(response) + '\n')
+
+
+def runbatch(input_file: str, output_file: str, workers: int = 2, timeout: float = 0.5):
+    """
+        writes the results of project.batch.run for the program files listed in input_file, one per line,
+        without their times
+    """
+    # creates output file (and intermediate folders) if it doesn't exist
+    if not os.path.exists(os.path.dirname(output_file)):
+        os.makedirs(os.path.dirname(output_file))
+
+    with open(input_file, 'r') as file:
+        program_files = file.read().split()
+
+    with open(output_file, 'w') as file:
+        for result in batch.run(program_files, 'lexer.txt', workers=workers, program_timeout=timeout):
+            result.pop('parse_time', None)
+            result.pop('run_time', None)
+            file.write(json.dumps(result) + '\n')
+
+
+def read_lexer(file_name: str) -> Lexer:
+    return load_lexer(file_name, Lexer.from_spec)
 
 
 if __name__ == '__main__':
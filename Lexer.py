@@ -1,20 +1,22 @@
 import os
-from project import DFA, Lexer, encode, decode
+from project import DFA, Lexer, encode, decode, load_lexer
 
 
 def runlexer(lexer_file: str, input_file: str, output_file: str):
     lexer = read_lexer(lexer_file)
-    input_word = read_word(input_file)
 
     # creates output file (and intermediate folders) if it doesn't exist
     if not os.path.exists(os.path.dirname(output_file)):
         os.makedirs(os.path.dirname(output_file))
 
+    # tokens are written as they are read; on error the output holds only the error message
     with open(output_file, 'w') as file:
         try:
-            for token, word in lexer.parse(input_word):
+            for token, word in lexer.lex_file(input_file):
                 file.write('{} {}\n'.format(token, encode(word)))
         except Lexer.ParseException as err:
+            file.seek(0)
+            file.truncate()
             file.write(str(err))
 
 
@@ -45,12 +47,6 @@ def read_lexer(file_name: str) -> Lexer:
     def parse_lexer(text: str) -> Lexer:
         return Lexer(list(parse_dfa(dfa_str) for dfa_str in text.split('\n\n')))
 
-    with open(file_name, 'r') as file:
-        return parse_lexer(file.read())
-
-
-def read_word(file_name: str) -> str:
-    with open(file_name, 'r') as file:
-        return file.read()
+    return load_lexer(file_name, parse_lexer, kind='dfa')
 
 
@@ -6,18 +6,39 @@ import argparse
 from math import ceil
 from subprocess import check_output
 from Lexer import runlexer
-from CompleteLexer import runcompletelexer, runparser
+from project.dfa import LazyDFA
+from CompleteLexer import runcompletelexer, runparser, runprogram, runserver, runbatch
 
 TESTER_DIR = "tests/"
 
 stage = None
 
 abs_total_1 = 107
-abs_total_31 = 107
-abs_total_32 = 8
+abs_total_31 = 112
+abs_total_32 = 10
 max_grade_31 = 0.7
 max_grade_32 = 0.3
 
+# checked, not graded: the inputs of T3/<check> are run by its function, which writes what is compared to the refs
+CHECKS = {
+    'run': ("3.3", "Program runs", runprogram),  # the store printed by the interpreter
+    'server': ("3.5", "Interpreter server", runserver),  # the responses of the server, without their times
+    'batch': ("3.6", "Batch runs", runbatch),  # the results of a pool of batch workers, without their times
+}
+
+# other ways of running the 3.1 tests, each expected to give the 3.1 refs; checked, not graded
+LEXER_ENGINES = {
+    # chunks this small split every input, so the speculative chunks always have to be stitched together
+    'parallel': lambda lexer, finput, foutput: runcompletelexer(lexer, finput, foutput, workers=2, chunk_size=4),
+    'lazy': lambda lexer, finput, foutput: runcompletelexer(lexer, finput, foutput, cache_size=LazyDFA.CACHE_SIZE),
+    # room for one state besides the sink and the initial state: flushed whenever the token changes, which
+    # T3.13.3 does only after long runs of one token, so its scans go on in the cache
+    'flushing': lambda lexer, finput, foutput: runcompletelexer(lexer, finput, foutput, cache_size=3),
+    # a cache with room for the sink and the initial state only: flushed at once, then thrashing, so the
+    # scans fall back to NFA simulation
+    'thrashing': lambda lexer, finput, foutput: runcompletelexer(lexer, finput, foutput, cache_size=2),
+}
+
 def run_test(test_set, test):
     if stage == 1:
         lexer = TESTER_DIR + "T{}/".format(stage) + test_set + '/' + test_set + ".lex"
@@ -99,6 +120,96 @@ def run_test_set(test_set):
 
     return set_total
 
+def run_check(check, test):
+    finput = TESTER_DIR + "T3/" + check + "/input/" + test + ".in"
+    foutput = TESTER_DIR + "T3/" + check + "/out/" + test + ".out"
+    freference = TESTER_DIR + "T3/" + check + "/ref/" + test + ".ref"
+
+    if os.path.isfile(foutput):
+        os.remove(foutput)
+
+    CHECKS[check][2](finput, foutput)
+    val = subprocess.call(["diff", "--ignore-all-space", foutput, freference])
+
+    name = "T3." + check + '.' + test
+    dots = '.' * max(1, 26 - len(name))
+    if val == 0:
+        print(name + dots + "passed")
+        return 1
+
+    print(name + dots + "failed")
+    return 0
+
+def run_checks(check):
+    section, title, _ = CHECKS[check]
+    print(section + ". " + title + "\n")
+    tests = sorted(f[:-len(".in")] for f in os.listdir(TESTER_DIR + "T3/" + check + "/input"))
+    total = 0
+    for test in tests:
+        total += run_check(check, test)
+    print("\nPassed for " + section + '.' * 12 + "[{}/{}]".format(total, len(tests)))
+
+def run_engine_test_set(engine, test_set):
+    input_dir = TESTER_DIR + "T3/regex/" + test_set + "/input/"
+    inputs = sorted(set(int(f.split('.')[-2]) for f in os.listdir(input_dir)))
+    inputs = [str(i) for i in inputs if i <= 10]
+
+    passed = 0
+    for test in inputs:
+        lexer = TESTER_DIR + "T3/regex/" + test_set + '/' + test_set + ".lex"
+        finput = input_dir + test_set + '.' + test + ".in"
+        foutput = TESTER_DIR + "T3/engines/" + engine + '/' + test_set + '.' + test + ".out"
+        freference = TESTER_DIR + "T3/regex/" + test_set + "/ref/" + test_set + '.' + test + ".ref"
+
+        if os.path.isfile(foutput):
+            os.remove(foutput)
+
+        LEXER_ENGINES[engine](lexer, finput, foutput)
+        if subprocess.call(["diff", "--ignore-all-space", foutput, freference]) == 0:
+            passed += 1
+
+    name = test_set + '.' + engine
+    print(name + '.' * max(1, 26 - len(name)) + "[{}/{}]".format(passed, len(inputs)))
+
+    return passed, len(inputs)
+
+def run_engine_tests():
+    print("3.4. Lexer engines\n")
+    regex_test_sets = os.listdir(TESTER_DIR + "T3/regex")
+    regex_test_sets = list(filter(lambda t : not('-' in t), regex_test_sets))
+    regex_test_sets.sort(key=lambda t : int(t[3:]))
+    total = 0
+    count = 0
+    for engine in LEXER_ENGINES:
+        for test_set in regex_test_sets:
+            passed, tests = run_engine_test_set(engine, test_set)
+            total += passed
+            count += tests
+    print("\nPassed for 3.4............[{}/{}]".format(total, count))
+
+def run_arena_tests():
+    # the 3.2 programs parsed into an Arena, expected to print as the 3.2 refs; checked, not graded
+    print("3.7. Arena parsing\n")
+    tests = sorted(f[:-len(".in")] for f in os.listdir(TESTER_DIR + "T3/prog/input"))
+    total = 0
+    for test in tests:
+        finput = TESTER_DIR + "T3/prog/input/" + test + ".in"
+        foutput = TESTER_DIR + "T3/engines/arena/" + test + ".out"
+        freference = TESTER_DIR + "T3/prog/ref/" + test + ".ref"
+
+        if os.path.isfile(foutput):
+            os.remove(foutput)
+
+        runparser(finput, foutput, arena=True)
+        name = "T3.arena." + test
+        dots = '.' * max(1, 26 - len(name))
+        if subprocess.call(["diff", "--ignore-all-space", foutput, freference]) == 0:
+            total += 1
+            print(name + dots + "passed")
+        else:
+            print(name + dots + "failed")
+    print("\nPassed for 3.7" + '.' * 12 + "[{}/{}]".format(total, len(tests)))
+
 def run_all():
     print("Stage {}\n".format(stage))
     if stage == 1:
@@ -136,6 +247,17 @@ def run_all():
             print("\nTotal for 3.2" + '.' * 13 + "[{}p]".format(total_32))
             print("Grade for 3.2" + '.' * 13 + "{:.2f}p".format(grade_32))
 
+            print()
+            run_checks('run')
+            print()
+            run_engine_tests()
+            print()
+            run_checks('server')
+            print()
+            run_checks('batch')
+            print()
+            run_arena_tests()
+
             print("\nTotal" + '.' * 20 + "[{}p]".format(total_31 + total_32))
             print("Final grade" + '.' * 14 + "{:.2f}p".format(grade_31 + grade_32))
 
@@ -152,6 +274,15 @@ def run_all():
             print("\nTotal for 3.1" + '.' * 13 + "[{}p]".format(total))
             print("Grade for 3.1" + '.' * 13 + "{:.2f}p".format((total / abs_total_31) * max_grade_31))
 
+        elif substage in CHECKS:
+            run_checks(substage)
+
+        elif substage == 'engines':
+            run_engine_tests()
+
+        elif substage == 'arena':
+            run_arena_tests()
+
         else: # substage == "prog"
             print("3.2. Imperative programs parsing\n")
             prog_tests = os.listdir(TESTER_DIR + "T3/prog/input")
@@ -166,7 +297,7 @@ def run_all():
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='FLA project checker')
     parser.add_argument('--stage', default='1',
-                        help='Project stage; for stage 3, use either 3, 3-regex or 3-prog')
+                        help='Project stage; for stage 3, use either 3, 3-regex, 3-prog, 3-run, 3-engines, 3-server, 3-batch or 3-arena')
     parser.add_argument('--set',
                         help='Test set')
     parser.add_argument('--test',
@@ -176,13 +307,14 @@ if __name__ == "__main__":
     if args.stage == '2':
         sys.exit("Stage 2 has its own separate checker")
 
-    if not args.stage in ['1', '3', '3-regex', '3-prog']:
-        sys.exit("Project stage argument can either be 1, 3, 3-regex or 3-prog")
+    if not args.stage in ['1', '3', '3-regex', '3-prog', '3-run', '3-engines', '3-server', '3-batch', '3-arena']:
+        sys.exit("Project stage argument can either be 1, 3, 3-regex, 3-prog, 3-run, 3-engines, 3-server, "
+                 "3-batch or 3-arena")
 
-    if args.stage == '3-prog' and args.set:
-        sys.exit("3-prog substage has only tests, no test sets")
+    if args.stage in ['3-prog', '3-run', '3-engines', '3-server', '3-batch', '3-arena'] and args.set:
+        sys.exit("{} substage has only tests, no test sets".format(args.stage))
 
-    if args.stage != '3-prog' and args.test and not args.set:
+    if args.stage not in ['3-prog', '3-run', '3-server', '3-batch'] and args.test and not args.set:
         sys.exit("Test set must be specified if you want to run a specific test")
 
     # if args.stage == '3-prog' or args.stage == '3':
@@ -199,6 +331,8 @@ if __name__ == "__main__":
             run_test(args.set, args.test)
         else:
             run_test_set(args.set)
+    elif args.test and substage in CHECKS:
+        run_check(substage, args.test)
     elif args.test:
         run_test("T3.prog", args.test)
     else:
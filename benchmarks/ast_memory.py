@@ -0,0 +1,58 @@
+"""
+    Memory held by a parsed program: the tree of Node objects versus the Arena, on generated programs.
+
+    python -m benchmarks.ast_memory [--statements N...]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from time import perf_counter
+
+from project import Parser
+from . import generators
+
+LEXER_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lexer.txt')
+
+
+def retained(parse, program: str):
+    """@return (result, bytes still allocated once parsing ended, peak bytes while parsing, seconds)"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start = perf_counter()
+        result = parse(program)
+        elapsed = perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, current, peak, elapsed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.ast_memory')
+    parser.add_argument('--statements', type=int, nargs='+', default=[10000, 50000])
+    args = parser.parse_args(argv)
+
+    program_parser = Parser(LEXER_FILE)
+    print('{:>10} {:>8} {:>8} {:>14} {:>14} {:>10}'.format('statements', 'nodes', 'form', 'retained KiB',
+                                                         'peak KiB', 'seconds'))
+    for statements in args.statements:
+        program = generators.program(statements)
+
+        arena, current, peak, elapsed = retained(lambda text: program_parser.parse_string(text, arena=True), program)
+        nodes = len(arena)
+        del arena
+        print('{:>10} {:>8} {:>8} {:14.0f} {:14.0f} {:10.3f}'.format(statements, nodes, 'arena', current / 1024,
+                                                                      peak / 1024, elapsed))
+
+        tree, current, peak, elapsed = retained(program_parser.parse_string, program)
+        del tree
+        print('{:>10} {:>8} {:>8} {:14.0f} {:14.0f} {:10.3f}'.format(statements, nodes, 'tree', current / 1024,
+                                                                      peak / 1024, elapsed))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,44 @@
+"""
+    Throughput of DFA.check_word (one word at a time) versus DFA.check_words (vectorized with NumPy).
+
+    python -m benchmarks.check_words [--words N] [--max-length N] [--regex REGEX]
+"""
+import argparse
+import random
+import sys
+from time import perf_counter
+
+from project import Regex
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.check_words')
+    parser.add_argument('--words', type=int, default=200000)
+    parser.add_argument('--max-length', type=int, default=16)
+    parser.add_argument('--regex', default='(a|b)*abb(a|b)*|[0-9]+')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    dfa = Regex.parse(args.regex).to_nfa().to_dfa(minimize=True)
+    generator = random.Random(args.seed)
+    words = [''.join(generator.choice('ab01c') for _ in range(generator.randint(0, args.max_length)))
+             for _ in range(args.words)]
+
+    start = perf_counter()
+    expected = [dfa.check_word(word) for word in words]
+    loop = perf_counter() - start
+
+    dfa.check_words(words[:1])  # pays the NumPy import before timing
+    start = perf_counter()
+    result = dfa.check_words(words)
+    batch = perf_counter() - start
+
+    if result != expected:
+        raise Exception('check_words disagrees with check_word')
+
+    print('check_word:  {:12.0f} words/s'.format(len(words) / loop))
+    print('check_words: {:12.0f} words/s ({:.1f}x)'.format(len(words) / batch, loop / batch))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
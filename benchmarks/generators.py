@@ -0,0 +1,97 @@
+"""
+    Synthetic inputs for the benchmarks; every generator is deterministic for a given size and seed.
+"""
+import random
+from string import ascii_lowercase
+
+
+def regex(length: int, seed: int = 0) -> str:
+    """@return a regex of about length chars, made of random concatenations, unions and stars over a-e"""
+    generator = random.Random(seed)
+    parts = []
+    size = 0
+
+    while size < length:
+        part = ''.join(generator.choice('abcde') for _ in range(generator.randint(1, 4)))
+        kind = generator.randint(0, 3)
+        if kind == 1:
+            part = '({}|{})'.format(part, generator.choice('abcde'))
+        elif kind == 2:
+            part = '({})*'.format(part)
+        elif kind == 3:
+            part = '({})+'.format(part)
+
+        parts.append(part)
+        size += len(part)
+
+    return ''.join(parts)
+
+
+def alternation(width: int) -> str:
+    """@return a union of width distinct words of 4 letters"""
+    def word(i: int) -> str:
+        letters = []
+        for _ in range(4):
+            i, letter = divmod(i, len(ascii_lowercase))
+            letters.append(ascii_lowercase[letter])
+
+        return ''.join(letters)
+
+    return '|'.join(word(i) for i in range(width))
+
+
+def binary_text(size: int, seed: int = 0) -> str:
+    """@return size random chars over a and b"""
+    generator = random.Random(seed)
+
+    return ''.join(generator.choice('ab') for _ in range(size))
+
+
+def statement(generator: random.Random, depth: int = 0) -> str:
+    variable = generator.choice('abcxyz')
+    kind = generator.randint(0, 9) if depth < 2 else 0
+
+    if kind == 8:
+        return 'if ({} == {}) then\n{}\nelse\n{}\nfi'.format(
+            variable, generator.randint(0, 9), statement(generator, depth + 1), statement(generator, depth + 1))
+    if kind == 9:
+        return 'while ({} < 0) do\nbegin\n{}\n{}\nend\nod'.format(
+            variable, statement(generator, depth + 1), statement(generator, depth + 1))
+
+    return '{} = {} {} {}'.format(variable, generator.choice('abcxyz'), generator.choice('+-*'), generator.randint(0, 99))
+
+
+def program(statements: int, seed: int = 0) -> str:
+    """
+        @return a valid program of the given number of top level statements (assignments, some if and while);
+        every variable is assigned first, and the loops never run
+    """
+    generator = random.Random(seed)
+    lines = ['begin'] + ['{} = {}'.format(x, i) for i, x in enumerate('abcxyz')]
+    lines.extend(statement(generator) for _ in range(statements))
+    lines.append('end')
+
+    return '\n'.join(lines)
+
+
+def source(size: int, seed: int = 0) -> str:
+    """@return a program of about size chars"""
+    return program(max(1, size // 21), seed)
+
+
+def loop(iterations: int) -> str:
+    """@return a program running a while loop with a few assignments iterations times"""
+    return '\n'.join([
+        'begin',
+        'a = {}'.format(iterations),
+        's = 0',
+        'b = 0',
+        'while (a > 0) do',
+        'begin',
+        's = s + a',
+        'b = a * 2',
+        'a = a - 1',
+        'end',
+        'od',
+        'end',
+    ])
@@ -0,0 +1,172 @@
+"""
+    Benchmarks of the regex -> NFA -> DFA -> lexer -> parser -> interpreter pipeline.
+
+    python -m benchmarks.run [--quick] [--repeat N] [--only NAME...] [--output results.json] [--compare old.json]
+
+    Every case is timed at growing input sizes: the input is built once, then the measured call is repeated and
+    its best and median times are kept; one more run under tracemalloc gives its peak memory. Results can be saved
+    as JSON and compared with the results of another commit.
+"""
+import argparse
+import atexit
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+from project import Regex, Lexer, Parser, Interpreter, load_lexer, write_ast
+from . import generators
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEXER_FILE = os.path.join(ROOT, 'lexer.txt')
+
+
+def temporary_file(text: str) -> str:
+    with tempfile.NamedTemporaryFile('w', suffix='.in', delete=False) as file:
+        file.write(text)
+    atexit.register(os.remove, file.name)
+
+    return file.name
+
+
+# name -> (size unit, sizes, quick sizes, setup(size) -> argument, measured call(argument))
+CASES: Dict[str, Tuple[str, List[int], List[int], Callable, Callable]] = {
+    'regex.parse': (
+        'regex chars', [1000, 4000, 16000], [1000],
+        lambda size: generators.regex(size),
+        Regex.parse,
+    ),
+    'regex.to_nfa': (
+        'regex chars', [1000, 4000, 16000], [1000],
+        lambda size: Regex.parse(generators.regex(size)),
+        lambda regex: regex.to_nfa(),
+    ),
+    'nfa.to_dfa': (
+        'alternation width', [50, 200, 800], [50],
+        lambda size: Regex.parse(generators.alternation(size)).to_nfa(),
+        lambda nfa: nfa.to_dfa(),
+    ),
+    'dfa.minimize': (
+        'alternation width', [50, 200, 800], [50],
+        lambda size: Regex.parse(generators.alternation(size)).to_nfa().to_dfa(),
+        lambda dfa: dfa.minimize(),
+    ),
+    'dfa.max_accepted': (
+        'input chars', [100000, 1000000], [100000],
+        lambda size: (Regex.parse('(a|b)*abb').to_nfa().to_dfa(), generators.binary_text(size)),
+        lambda args: args[0].max_accepted(args[1]),
+    ),
+    'lexer.parse': (
+        'input chars', [100000, 1000000], [100000],
+        lambda size: (load_lexer(LEXER_FILE, Lexer.from_spec), generators.source(size)),
+        lambda args: args[0].parse(args[1]),
+    ),
+    'parser.parse': (
+        'statements', [1000, 10000, 50000], [1000],
+        lambda size: (Parser(LEXER_FILE), temporary_file(generators.program(size))),
+        lambda args: args[0].parse(args[1]),
+    ),
+    'ast.str': (
+        'statements', [1000, 10000, 50000], [1000],
+        lambda size: Parser(LEXER_FILE).parse_string(generators.program(size)),
+        str,
+    ),
+    'printer.write_ast': (
+        'statements', [1000, 10000, 50000], [1000],
+        lambda size: Parser(LEXER_FILE).parse_string(generators.program(size)),
+        lambda ast: write_ast(ast, io.StringIO()),
+    ),
+    'interpreter.interpret': (
+        'loop iterations', [10000, 100000, 1000000], [10000],
+        lambda size: (Interpreter(LEXER_FILE), temporary_file(generators.loop(size))),
+        lambda args: args[0].interpret(args[1]),
+    ),
+}
+
+
+def measure(setup: Callable, call: Callable, size: int, repeat: int) -> Dict:
+    argument = setup(size)
+
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        call(argument)
+        times.append(perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        call(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {'best': min(times), 'median': statistics.median(times), 'peak_memory': peak}
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def compare(results: List[Dict], baseline_file: str, threshold: float):
+    """Prints the median time of every result relative to the same case and size in the baseline results."""
+    with open(baseline_file) as file:
+        baseline = {(result['name'], result['size']): result for result in json.load(file)['results']}
+
+    print('\ncompared with {}:'.format(baseline_file))
+    for result in results:
+        old = baseline.get((result['name'], result['size']))
+        if old is None:
+            continue
+
+        ratio = result['median'] / old['median']
+        flag = 'slower' if ratio > threshold else 'faster' if ratio < 1 / threshold else ''
+        print('{:24} {:>10} {:8.2f}x {}'.format(result['name'], result['size'], ratio, flag))
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.run')
+    parser.add_argument('--quick', action='store_true', help='only the smallest size of every case, run once')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), help='run only these cases')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare with')
+    parser.add_argument('--threshold', type=float, default=1.1, help='ratio reported as a change (default 1.1)')
+    args = parser.parse_args(argv)
+    repeat = 1 if args.quick else args.repeat
+
+    # Regex.to_nfa recurses once per concatenation, well past the default limit on the larger sizes
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 50000))
+
+    results = []
+    print('{:24} {:>10} {:18} {:>10} {:>10} {:>12}'.format('case', 'size', 'unit', 'best s', 'median s', 'peak KiB'))
+    for name in args.only or CASES:
+        unit, sizes, quick_sizes, setup, call = CASES[name]
+
+        for size in quick_sizes if args.quick else sizes:
+            result = dict(name=name, size=size, unit=unit, **measure(setup, call, size, repeat))
+            results.append(result)
+            print('{:24} {:>10} {:18} {:10.4f} {:10.4f} {:12.0f}'.format(
+                name, size, unit, result['best'], result['median'], result['peak_memory'] / 1024))
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump({'commit': commit(), 'python': platform.python_version(), 'repeat': repeat,
+                       'results': results}, file, indent=2)
+
+    if args.compare:
+        compare(results, args.compare, args.threshold)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -108,15 +108,15 @@ def parse_dfa(text):
 def epsilon_closure(nfa, state):
     """Get epsilon closure of a state"""
 
-    def epsilon_closure_aux(nfa, state, closure):
-        for next_state in nfa.delta.get((state, ""), set()):
+    closure = {state}
+    stack = [state]  # explicit stack: long epsilon chains do not hit the recursion limit
+    while stack:
+        for next_state in nfa.delta.get((stack.pop(), ""), set()):
             if next_state not in closure:
-                closure |= {next_state}
-                closure |= epsilon_closure_aux(nfa, next_state, closure)
+                closure.add(next_state)
+                stack.append(next_state)
 
-        return closure
-
-    return epsilon_closure_aux(nfa, state, {state})
+    return closure
 
 
 def symmetric_difference(lhs, rhs):
@@ -150,17 +150,21 @@ def symmetric_difference(lhs, rhs):
 def empty_language(a):
     visited = [False for state in a.states]
 
-    def dfs_reach_final(state):
-        visited[state] = True
-        for ch in a.alphabet:
-            nstate = a.delta[(state, ch)]
-            if nstate in a.final_states:
-                return True
-
-            if not visited[nstate]:
-                if dfs_reach_final(nstate):
+    def dfs_reach_final(start):
+        # explicit stack: the search may go as deep as the number of states
+        visited[start] = True
+        stack = [start]
+        while stack:
+            state = stack.pop()
+            for ch in a.alphabet:
+                nstate = a.delta[(state, ch)]
+                if nstate in a.final_states:
                     return True
 
+                if not visited[nstate]:
+                    visited[nstate] = True
+                    stack.append(nstate)
+
         return False
 
     return not dfs_reach_final(a.start_state)
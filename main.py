@@ -18,9 +18,17 @@ def write_dfa(file_name: str, dfa: DFA):
 
 
 if __name__ == '__main__':
-    if len(sys.argv) != 3:
-        raise Exception("Correct format: python main.py <in_file> <out_file>")
+    minimize = '--minimize' in sys.argv[1:]
+    args = [arg for arg in sys.argv[1:] if arg != '--minimize']
+    if len(args) != 2:
+        raise Exception("Correct format: python main.py <in_file> <out_file> [--minimize]")
 
-    regex = read_regex(sys.argv[1])
+    regex = read_regex(args[0])
+    dfa = regex.to_nfa().to_dfa()
 
-    write_dfa(sys.argv[2], regex.to_nfa().to_dfa())
+    if minimize:
+        minimized = dfa.minimize()
+        print('states: {} -> {}'.format(dfa.states_count(), minimized.states_count()), file=sys.stderr)
+        dfa = minimized
+
+    write_dfa(args[1], dfa)
@@ -3,5 +3,8 @@ from .dfa import DFA
 from .nfa import NFA
 from .regex import Regex
 from .parser import Parser
+from .arena import Arena
 from .interpreter import Interpreter
+from .printer import Printer, write_ast
+from .cache import cached_lexer, load_lexer
 from .utils import *
@@ -0,0 +1,123 @@
+from array import array
+from typing import Dict, List, Union
+
+from .ast import Node, InstructionList, Expr, While, If, Assign
+
+# node kinds; binary expressions follow, one kind per operator
+INSTRUCTION_LIST = 0
+ASSIGN = 1
+WHILE = 2
+IF = 3
+VARIABLE = 4
+INTEGER = 5
+BIG_INTEGER = 6  # a literal outside int64, kept in Arena.big_integers
+OPERATORS = ['+', '-', '*', '>', '<', '==']
+BINARY_KINDS = {operator: 7 + i for i, operator in enumerate(OPERATORS)}
+
+INT64 = 1 << 63
+
+
+class Arena:
+    """
+        A whole AST as a structure of arrays: node i has kinds[i] and up to three operands in
+        first[i], second[i] and third[i], which are child node indices, or for the leaves the index of the
+        variable name in names / the value of the integer literal. An instruction list keeps its children in
+        items[first[i]:first[i] + second[i]].
+        Nodes are added bottom-up, so children always come before their parent. Built by the parser through the
+        same add_* calls as TreeBuilder.
+    """
+
+    def __init__(self):
+        self.kinds = array('B')
+        self.first = array('q')  # wide enough for the literals
+        self.second = array('i')
+        self.third = array('i')
+        self.items = array('i')
+        self.names: List[str] = []
+        self.big_integers: List[int] = []
+        self.root = -1  # an empty program has no root
+        self.__name_index: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def nbytes(self) -> int:
+        """@return the size of the arrays, names and literals excluded"""
+        return sum(len(values) * values.itemsize
+                   for values in (self.kinds, self.first, self.second, self.third, self.items))
+
+    def __add(self, kind: int, first: int = 0, second: int = 0, third: int = 0) -> int:
+        self.kinds.append(kind)
+        self.first.append(first)
+        self.second.append(second)
+        self.third.append(third)
+
+        return len(self.kinds) - 1
+
+    def add_instruction_list(self, instructions: List[int]) -> int:
+        start = len(self.items)
+        self.items.extend(instructions)
+
+        return self.__add(INSTRUCTION_LIST, start, len(instructions))
+
+    def add_expr(self, type: str, left: Union[str, int], right: int = None) -> int:
+        if type == 'v':
+            if left not in self.__name_index:
+                self.__name_index[left] = len(self.names)
+                self.names.append(left)
+
+            return self.__add(VARIABLE, self.__name_index[left])
+
+        if type == 'i':
+            value = int(left)
+            if -INT64 <= value < INT64:
+                return self.__add(INTEGER, value)
+
+            self.big_integers.append(value)
+            return self.__add(BIG_INTEGER, len(self.big_integers) - 1)
+
+        return self.__add(BINARY_KINDS[type], left, right)
+
+    def add_while(self, expr: int, prog: int) -> int:
+        return self.__add(WHILE, expr, prog)
+
+    def add_if(self, expr: int, then_branch: int, else_branch: int) -> int:
+        return self.__add(IF, expr, then_branch, else_branch)
+
+    def add_assign(self, variable: int, expr: int) -> int:
+        return self.__add(ASSIGN, variable, expr)
+
+    def to_ast(self, index: int = None) -> Node:
+        """
+            Rebuilds the Node objects of a subtree (default: the whole program, None if it is empty); literals come
+            back in their canonical form (e.g. '007' is printed as 7).
+        """
+        if index is None and self.root == -1:
+            return None
+
+        nodes: List[Node] = []
+
+        # children come before their parents, so a single pass over the prefix of the arrays builds everything
+        for i in range(len(self) if index is None else index + 1):
+            kind = self.kinds[i]
+            first = self.first[i]
+            second = self.second[i]
+
+            if kind == INSTRUCTION_LIST:
+                nodes.append(InstructionList([nodes[item] for item in self.items[first:first + second]]))
+            elif kind == ASSIGN:
+                nodes.append(Assign(nodes[first], nodes[second]))
+            elif kind == WHILE:
+                nodes.append(While(nodes[first], nodes[second]))
+            elif kind == IF:
+                nodes.append(If(nodes[first], nodes[second], nodes[self.third[i]]))
+            elif kind == VARIABLE:
+                nodes.append(Expr('v', self.names[first]))
+            elif kind == INTEGER:
+                nodes.append(Expr('i', str(first)))
+            elif kind == BIG_INTEGER:
+                nodes.append(Expr('i', str(self.big_integers[first])))
+            else:
+                nodes.append(Expr(OPERATORS[kind - BINARY_KINDS['+']], nodes[first], nodes[second]))
+
+        return nodes[self.root if index is None else index]
@@ -1,122 +1,111 @@
-TAB = '  '  # two whitespaces
-
-
-class Node:
-    def __init__(self, *args):
-        self.height = int(args[0])  # the level of indentation required for current Node
-
-    def __str__(self):
-        return 'prog'
-
-    @staticmethod
-    def one_tab(line):
-        """Formats the line of an argument from an expression."""
-        return TAB + line + '\n'
-
-    def final_print_str(self, print_str):
-        """Adds height number of tabs at the beginning of every line that makes up the current Node."""
-        return (self.height * TAB).join(print_str)
-
-
-class InstructionList(Node):
-    """begin <instruction_list> end"""
-
-    def __init__(self, *args):  # args = height, [Nodes in instruction_list]
-        super().__init__(args[0])
-        self.list = args[1]
-
-    def __str__(self):
-        print_str = ['[\n']
-        for expr in self.list:
-            print_str.append(self.one_tab(expr.__str__()))
-        print_str.append(']')
-
-        return self.final_print_str(print_str)
-
-
-class Expr(Node):
-    """<expr> + <expr> | <expr> - <expr> | <expr> * <expr> | <expr> > <expr> | <expr> == <expr> | <variable> | <integer>"""
-
-    def __init__(self, *args):  # args = height, '+' | '-' | '*' | '>' | '==' | 'v' | 'i', left_side, *right_side
-        super().__init__(args[0])
-        self.type = args[1]
-        self.left = args[2]
-        if len(args) > 3:
-            self.right = args[3]
-        else:
-            # variable and integer have no right_side
-            self.right = None
-
-    def __str__(self):
-        name = 'expr'
-        if self.type == 'v':
-            name = 'variable'
-        elif self.type == 'i':
-            name = 'integer'
-        elif self.type == '+':
-            name = 'plus'
-        elif self.type == '-':
-            name = 'minus'
-        elif self.type == '*':
-            name = 'multiply'
-        elif self.type == '>':
-            name = 'greaterthan'
-        elif self.type == '==':
-            name = 'equals'
-
-        print_str = [name + ' [\n', self.one_tab(str(self.left))]
-        if self.right:
-            print_str.append(self.one_tab(str(self.right)))
-        print_str.append(']')
-
-        return self.final_print_str(print_str)
-
-
-class While(Node):
-    """while (<expr>) do <prog> od"""
-
-    def __init__(self, *args):  # args = height, Node_expr, Node_prog
-        super().__init__(args[0])
-        self.expr = args[1]
-        self.prog = args[2]
-
-    def __str__(self):
-        print_str = ['while [\n',
-                     self.one_tab(self.expr.__str__()),
-                     self.one_tab('do ' + self.prog.__str__()),
-                     ']']
-        return self.final_print_str(print_str)
-
-
-class If(Node):
-    """if (<expr>) then <prog> else <prog> fi"""
-
-    def __init__(self, *args):  # args = height, Node_expr, Node_then, Node_else
-        super().__init__(args[0])
-        self.expr = args[1]
-        self.then_branch = args[2]
-        self.else_branch = args[3]
-
-    def __str__(self):
-        print_str = ['if [\n',
-                     self.one_tab(self.expr.__str__()),
-                     self.one_tab('then ' + self.then_branch.__str__()),
-                     self.one_tab('else ' + self.else_branch.__str__()),
-                     ']']
-        return self.final_print_str(print_str)
-
-
-class Assign(Node):
-    """<variable> '=' <expr>"""
-
-    def __init__(self, *args):  # args = height, Node_variable, Node_expr
-        super().__init__(args[0])
-        self.variable = args[1]
-        self.expr = args[2]
-
-    def __str__(self):
-        print_str = ['assign [\n',
-                     self.one_tab(self.variable.__str__()),
-                     self.one_tab(self.expr.__str__()),
-                     ']']
-        return self.final_print_str(print_str)
+from typing import Tuple
+
+TAB = '  '  # two whitespaces
+
+
+class Node:
+    __slots__ = ()
+
+    def __str__(self):
+        """The printed tree; indentation follows the depth of every node, computed while printing."""
+        from io import StringIO
+        from .printer import write_ast
+
+        out = StringIO()
+        write_ast(self, out)
+
+        return out.getvalue()
+
+    def children(self) -> Tuple['Node', ...]:
+        """@return the nodes directly below this one, in program order"""
+        return ()
+
+
+class InstructionList(Node):
+    """begin <instruction_list> end"""
+    __slots__ = ('list',)
+
+    def __init__(self, *args):  # args = [Nodes in instruction_list]
+        self.list = args[0]
+
+    def children(self) -> Tuple[Node, ...]:
+        return tuple(self.list)
+
+
+class Expr(Node):
+    """<expr> + <expr> | <expr> - <expr> | <expr> * <expr> | <expr> > <expr> | <expr> == <expr> | <variable> | <integer>"""
+    __slots__ = ('type', 'left', 'right')
+
+    def __init__(self, *args):  # args = '+' | '-' | '*' | '>' | '==' | 'v' | 'i', left_side, *right_side
+        self.type = args[0]
+        self.left = args[1]
+        if len(args) > 2:
+            self.right = args[2]
+        else:
+            # variable and integer have no right_side
+            self.right = None
+
+    def children(self) -> Tuple[Node, ...]:
+        # the left side of a variable or an integer is its name or value
+        return (self.left, self.right) if self.right is not None else ()
+
+
+class While(Node):
+    """while (<expr>) do <prog> od"""
+    __slots__ = ('expr', 'prog')
+
+    def __init__(self, *args):  # args = Node_expr, Node_prog
+        self.expr = args[0]
+        self.prog = args[1]
+
+    def children(self) -> Tuple[Node, ...]:
+        return self.expr, self.prog
+
+
+class If(Node):
+    """if (<expr>) then <prog> else <prog> fi"""
+    __slots__ = ('expr', 'then_branch', 'else_branch')
+
+    def __init__(self, *args):  # args = Node_expr, Node_then, Node_else
+        self.expr = args[0]
+        self.then_branch = args[1]
+        self.else_branch = args[2]
+
+    def children(self) -> Tuple[Node, ...]:
+        return self.expr, self.then_branch, self.else_branch
+
+
+class Assign(Node):
+    """<variable> '=' <expr>"""
+    __slots__ = ('variable', 'expr')
+
+    def __init__(self, *args):  # args = Node_variable, Node_expr
+        self.variable = args[0]
+        self.expr = args[1]
+
+    def children(self) -> Tuple[Node, ...]:
+        return self.variable, self.expr
+
+
+class TreeBuilder:
+    """Node factory used by the parser to build the tree of Node objects; Arena has the same add_* methods"""
+    add_instruction_list = staticmethod(InstructionList)
+    add_expr = staticmethod(Expr)
+    add_while = staticmethod(While)
+    add_if = staticmethod(If)
+    add_assign = staticmethod(Assign)
+
+
+def depth(ast: Node) -> int:
+    """
+        Walks the tree with an explicit stack, so it works at any nesting depth
+        @return the number of nodes on the longest path from ast down to a leaf
+    """
+    deepest = 0
+    pending = [(ast, 1)] if ast is not None else []
+    while pending:
+        node, level = pending.pop()
+        deepest = max(deepest, level)
+        pending.extend((child, level + 1) for child in node.children())
+
+    return deepest
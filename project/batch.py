@@ -0,0 +1,119 @@
+"""
+    Runs many independent programs across a pool of worker processes.
+
+    python -m project.batch run <dir> [--pattern '*.in'] [--lexer lexer.txt] [--vm]
+                                      [--workers N] [--chunksize N] [--timeout SECONDS]
+
+    One JSON line is printed per program, in the order of the sorted file names:
+        {"file": ..., "store": {...}, "steps": n, "parse_time": s, "run_time": s} or {"file": ..., "error": "..."}
+    --workers 0 runs everything in the current process, which is the sequential baseline.
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Dict, List
+
+from .cache import load_lexer
+from .interpreter import Interpreter
+from .lexer import Lexer
+
+# state of a worker process, set once by init_worker
+worker: Interpreter = None
+timeout: float = 0
+
+
+class Timeout(Exception):
+    pass
+
+
+def init_worker(compiled_lexer: bytes, vm: bool, program_timeout: float):
+    """
+        Builds the interpreter of a worker process. The lexer arrives already compiled (see Lexer.dump),
+        so every worker only maps its tables instead of building the automaton again.
+    """
+    global worker, timeout
+
+    worker = Interpreter(Lexer.load(compiled_lexer), vm=vm)
+    timeout = program_timeout
+
+
+def alarm(signum, frame):
+    raise Timeout('program exceeded {}s'.format(timeout))
+
+
+def run_program(program_file: str) -> Dict:
+    result = {'file': program_file}
+    stats = {}
+
+    if timeout:
+        signal.signal(signal.SIGALRM, alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        result['store'] = worker.interpret(program_file, stats)
+        result.update(stats)
+    except Exception as err:
+        result['error'] = '{}: {}'.format(type(err).__name__, err)
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+    return result
+
+
+def run(program_files: List[str], lexer_file: str, vm: bool = False, workers: int = None,
+        chunksize: int = 1, program_timeout: float = 0):
+    """
+        Interprets the programs and yields their results in the order of program_files.
+        @param workers - number of worker processes (default: one per core), 0 to run in this process
+        @param program_timeout - seconds a single program may run before it is stopped, 0 for no limit
+    """
+    buffer = io.BytesIO()
+    load_lexer(lexer_file, Lexer.from_spec).dump(buffer)
+    compiled_lexer = buffer.getvalue()
+
+    if workers == 0:
+        init_worker(compiled_lexer, vm, program_timeout)
+        yield from map(run_program, program_files)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=init_worker,
+                             initargs=(compiled_lexer, vm, program_timeout)) as executor:
+        yield from executor.map(run_program, program_files, chunksize=chunksize)
+
+
+def main(argv: List[str]):
+    parser = argparse.ArgumentParser(prog='python -m project.batch')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    command = commands.add_parser('run', help='interpret every program file of a directory')
+    command.add_argument('directory')
+    command.add_argument('--pattern', default='*', help='glob selecting the program files (default: all files)')
+    command.add_argument('--lexer', default='lexer.txt')
+    command.add_argument('--vm', action='store_true',
+                         help='run every program on the bytecode VM, not only the deeply nested ones')
+    command.add_argument('--workers', type=int, default=None, help='default: one per core, 0 for no pool')
+    command.add_argument('--chunksize', type=int, default=1, help='programs sent to a worker at once')
+    command.add_argument('--timeout', type=float, default=0, help='seconds allowed per program')
+    args = parser.parse_args(argv)
+
+    program_files = sorted(path for path in glob.glob(os.path.join(args.directory, args.pattern))
+                           if os.path.isfile(path))
+
+    start = perf_counter()
+    failed = 0
+    for result in run(program_files, args.lexer, args.vm, args.workers, args.chunksize, args.timeout):
+        failed += 'error' in result
+        print(json.dumps(result))
+
+    print('{} programs, {} failed, {:.3f}s'.format(len(program_files), failed, perf_counter() - start),
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
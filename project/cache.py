@@ -0,0 +1,102 @@
+import mmap
+import os
+import struct
+import tempfile
+from collections import OrderedDict
+from functools import lru_cache
+from hashlib import sha256
+from threading import Lock
+from typing import Callable, Tuple
+
+from . import dfa, lexer, nfa, regex
+from .lexer import Lexer
+
+# Bump when the compiled format changes; changes to the code building the automata are caught by builder_hash
+FORMAT_VERSION = 1
+
+# Lexers already loaded by this process: (kind, absolute path, mtime, content hash) -> Lexer, least recently
+# used first
+REGISTRY_SIZE = 32
+registry: 'OrderedDict[Tuple[str, str, int, str], Lexer]' = OrderedDict()
+registry_lock = Lock()
+
+
+def cache_dir() -> str:
+    """$INTERPRETER_CACHE_DIR; the on-disk cache is off unless it is set"""
+    return os.environ.get('INTERPRETER_CACHE_DIR', '')
+
+
+@lru_cache(maxsize=None)
+def builder_hash() -> str:
+    """hash of the source of the modules building and saving lexers: editing any of them invalidates the cache"""
+    digest = sha256()
+    for module in (regex, nfa, dfa, lexer):
+        with open(module.__file__, 'rb') as file:
+            digest.update(file.read())
+
+    return digest.hexdigest()
+
+
+def cached_lexer(spec: str, build: Callable[[], Lexer], kind: str = 'regex') -> Lexer:
+    """
+        Returns the lexer compiled from spec, loading it from the on-disk cache (memory mapped) if another process
+        already compiled the same spec, calling build() and saving its result otherwise.
+        @param kind - the format of spec, part of the key
+    """
+    directory = cache_dir()
+    if not directory:
+        return build()
+
+    key = sha256('{}\0{}\0{}\0{}'.format(FORMAT_VERSION, builder_hash(), kind, spec).encode('utf-8')).hexdigest()
+    path = os.path.join(directory, key + '.lexer')
+
+    try:
+        with open(path, 'rb') as file:
+            return Lexer.load(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+    except (OSError, ValueError, KeyError, TypeError, struct.error):
+        pass  # missing, truncated or unreadable, compile it again
+
+    lexer = build()
+
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # write to a temporary file first, so concurrent processes never see a partial file
+        descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                lexer.dump(file)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+    except (OSError, ValueError):
+        pass  # the cache is only an optimization
+
+    return lexer
+
+
+def load_lexer(lexer_file: str, build: Callable[[str], Lexer], kind: str = 'regex') -> Lexer:
+    """
+        Returns the lexer for a spec file, compiled at most once per process while the file stays the same
+        (and at most once across processes thanks to cached_lexer).
+        @param build - compiles the lexer from the text of the spec
+    """
+    path = os.path.abspath(lexer_file)
+    with open(path, 'r') as file:
+        mtime = os.fstat(file.fileno()).st_mtime_ns
+        spec = file.read()
+    key = (kind, path, mtime, sha256(spec.encode('utf-8')).hexdigest())
+
+    with registry_lock:
+        if key in registry:
+            registry.move_to_end(key)
+            return registry[key]
+
+    lexer = cached_lexer(spec, lambda: build(spec), kind)
+
+    with registry_lock:
+        registry[key] = lexer
+        while len(registry) > REGISTRY_SIZE:
+            registry.popitem(last=False)
+
+    return lexer
@@ -0,0 +1,145 @@
+import operator
+from typing import Callable, Dict, List, Optional
+
+from .ast import Assign, Expr, While, InstructionList, If, Node
+from .resolver import Resolution, Unassigned, resolve
+
+Store = List[int]  # variable values by slot, then the order of their first assignment, see Resolution
+
+OPERATORS: Dict[str, Callable[[int, int], int]] = {
+    '+': operator.add,
+    '-': operator.sub,
+    '*': operator.mul,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+}
+
+
+def compile_expr(expr: Expr, resolution: Resolution) -> Callable[[Store], int]:
+    """Turns an expression into a closure evaluating it against a store."""
+    if expr.type == 'i':
+        value = int(expr.left)
+
+        return lambda store: value
+
+    if expr.type == 'v':
+        slot = resolution.slots[expr.left]
+        if expr not in resolution.maybe_unassigned:
+            return operator.itemgetter(slot)
+
+        def load(store: Store) -> int:
+            value = store[slot]
+            if value.__class__ is Unassigned:
+                value.fail()
+
+            return value
+
+        return load
+
+    op = OPERATORS[expr.type]
+    left_slot = safe_slot(expr.left, resolution)
+    right_slot = safe_slot(expr.right, resolution)
+
+    # an operand read from a slot known to be assigned, or a constant, is inlined instead of called
+    if left_slot is not None:
+        if right_slot is not None:
+            return lambda store: op(store[left_slot], store[right_slot])
+        if expr.right.type == 'i':
+            right_value = int(expr.right.left)
+
+            return lambda store: op(store[left_slot], right_value)
+    elif right_slot is not None and expr.left.type == 'i':
+        left_value = int(expr.left.left)
+
+        return lambda store: op(left_value, store[right_slot])
+
+    left = compile_expr(expr.left, resolution)
+    right = compile_expr(expr.right, resolution)
+
+    return lambda store: op(left(store), right(store))
+
+
+def safe_slot(expr: Expr, resolution: Resolution) -> Optional[int]:
+    """@return the slot read by expr if it is a variable that is always assigned when read, else None"""
+    if expr.type == 'v' and expr not in resolution.maybe_unassigned:
+        return resolution.slots[expr.left]
+
+    return None
+
+
+def counted(function: Callable, steps: List[int]) -> Callable:
+    """Wraps a compiled statement or condition so that every call is counted in steps[0]."""
+    def run(store: Store):
+        steps[0] += 1
+        return function(store)
+
+    return run
+
+
+def compile_program(ast: Node, steps: List[int] = None, resolution: Resolution = None) -> Callable[[Store], None]:
+    """
+        Turns a program into a closure executing it against a store, a list made by resolution.new_store().
+        The AST is walked only once.
+        @param steps - if given, steps[0] is incremented for every assignment and condition evaluated
+        @param resolution - the variable slots of ast, resolved here if not given
+    """
+    if resolution is None:
+        resolution = resolve(ast)
+
+    if isinstance(ast, Assign):
+        slot = resolution.slots[ast.variable.left]
+        expr = compile_expr(ast.expr, resolution)
+
+        if ast in resolution.maybe_first:
+            first_assigned = len(resolution.names)  # the list of first assignments, see Resolution.new_store
+
+            def run_assign(store: Store):
+                value = expr(store)
+                if store[slot].__class__ is Unassigned:
+                    store[first_assigned].append(slot)
+                store[slot] = value
+        else:
+            def run_assign(store: Store):
+                store[slot] = expr(store)
+
+        return counted(run_assign, steps) if steps is not None else run_assign
+
+    if isinstance(ast, If):
+        condition = compile_expr(ast.expr, resolution)
+        then_branch = compile_program(ast.then_branch, steps, resolution)
+        else_branch = compile_program(ast.else_branch, steps, resolution)
+        if steps is not None:
+            condition = counted(condition, steps)
+
+        def run_if(store: Store):
+            if condition(store):
+                then_branch(store)
+            else:
+                else_branch(store)
+
+        return run_if
+
+    if isinstance(ast, InstructionList):
+        instructions = tuple(compile_program(instruction, steps, resolution) for instruction in ast.list)
+
+        def run_instruction_list(store: Store):
+            for instruction in instructions:
+                instruction(store)
+
+        return run_instruction_list
+
+    if isinstance(ast, While):
+        condition = compile_expr(ast.expr, resolution)
+        body = compile_program(ast.prog, steps, resolution)
+        if steps is not None:
+            condition = counted(condition, steps)
+
+        def run_while(store: Store):
+            while condition(store):
+                body(store)
+
+        return run_while
+
+    # bare expressions have no effect on the store
+    return lambda store: None
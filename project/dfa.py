@@ -1,38 +1,97 @@
+from array import array
 from collections import deque
-from typing import Set, Dict, Union, List, Tuple
+from typing import Set, Dict, Union, List, Tuple, Callable, Sequence
 
 
 class DFA:
-    def check_word(self, word: str) -> bool:
-        current_state = self.__initial_state
+    def check_word(self, word: str, start: int = 0, end: int = None) -> bool:
+        """checks word[start:end] without copying it"""
+        classes = self.__classes
+        table = self.__table
+        current_state = self.__start
 
-        for x in word:
-            current_state = self.__next_state(current_state, x)
-            if current_state in self.__sink_states:
+        for i in range(start, len(word) if end is None else end):
+            current_state = table[current_state + classes.get(word[i], 0)]
+            if not current_state:
                 return False
 
-        return current_state in self.__final_states
+        return self.__accept[current_state] == 1
 
-    def max_accepted(self, word: str) -> Tuple[int, int]:
+    def check_words(self, words: Sequence[str]) -> List[bool]:
         """
-            finds max accepted len from a word (text)
-            @return (x, y) -> x - len of accepted word | y - the index of last read char
+            checks many words at once. With NumPy (optional) the words are turned into one flat array of char classes
+            and all of them advance one char at a time through the table, by fancy indexing; after each step the
+            words that ended or fell in the sink leave the scan. Without NumPy every word goes through check_word.
+            @return list of bools, one entry per word, with or without NumPy
         """
-        current_state = self.__initial_state
+        try:
+            import numpy
+        except ImportError:
+            return [self.check_word(word) for word in words]
+
+        table = numpy.frombuffer(self.__table, dtype=numpy.intc)
+        accept = numpy.frombuffer(self.__accept, dtype=numpy.uint8)
+
+        # char -> class through a lookup indexed by code point; anything past the alphabet is class 0
+        chars = {x: cls for x, cls in self.__classes.items() if len(x) == 1}
+        lookup = numpy.zeros(max(map(ord, chars), default=0) + 2, dtype=numpy.intc)
+        for x, cls in chars.items():
+            lookup[ord(x)] = cls
+        code_points = numpy.frombuffer(''.join(words).encode('utf-32-le'), dtype=numpy.uint32)
+        classes = lookup[numpy.minimum(code_points, len(lookup) - 1)]
+
+        # word i is classes[starts[i]:starts[i] + lengths[i]]
+        lengths = numpy.fromiter(map(len, words), dtype=numpy.intp, count=len(words))
+        starts = numpy.cumsum(lengths) - lengths
+
+        states = numpy.full(len(words), self.__start, dtype=numpy.intc)
+        active = numpy.arange(len(words))
+        for i in range(int(lengths.max(initial=0))):
+            active = active[(lengths[active] > i) & (states[active] != 0)]
+            if not active.size:
+                break
+
+            states[active] = table[states[active] + classes[starts[active] + i]]
+
+        return accept[states].astype(bool).tolist()
+
+    def max_accepted(self, word: str, start: int = 0, end: int = None) -> Tuple[int, int]:
+        """
+            finds max accepted len from a word (text), scanning word[start:end] in place
+            @return (x, y) -> x - len of accepted word | y - the index of last read char, relative to start
+        """
+        accepted, last, _ = self.longest_match(word, start, end)
+
+        return accepted, last
+
+    def longest_match(self, word: str, start: int = 0, end: int = None) -> Tuple[int, int, Union[None, int]]:
+        """
+            same as max_accepted, also telling which final state accepted the longest prefix
+            @return (x, y, z) -> x, y as in max_accepted | z - the tag of that final state (the state itself if the
+            DFA is untagged), None if no non-empty prefix is accepted
+        """
+        classes = self.__classes
+        table = self.__table
+        accept = self.__accept
+        current_state = self.__start
+        end = len(word) if end is None else end
 
-        accepted = 0
-        for i in range(len(word)):
-            current_state = self.__next_state(current_state, word[i])
+        accepted = start
+        accepted_state = None
+        for i in range(start, end):
+            current_state = table[current_state + classes.get(word[i], 0)]
 
-            if current_state in self.__final_states:
+            if accept[current_state]:
                 accepted = i + 1
-            elif current_state in self.__sink_states:
-                return accepted, i
+                accepted_state = current_state
+            elif not current_state:
+                return accepted - start, i - start, self.__labels.get(accepted_state)
 
-        return accepted, len(word)
+        return accepted - start, end - start, self.__labels.get(accepted_state)
 
     def __init__(self, alphabet: Set[str], initial_state: int, final_states: Set[int],
-                 delta: Dict[int, Dict[str, int]]):
+                 delta: Dict[int, Dict[str, int]], tags: Dict[int, int] = None):
+        """@param tags - optional label of each final state, reported by longest_match"""
         def states() -> Set[int]:
             _states = {initial_state}
             _states.update(final_states)
@@ -75,8 +134,235 @@ class DFA:
         self.__initial_state = initial_state
         self.__final_states = final_states
         self.__delta = delta
+        self.__tags = tags or {}
         self.__states = states = states()
         self.__sink_states = sink_states()
+        self.__compile()
+
+    def __compile(self):
+        """
+            Builds the table used for scanning:
+            - characters with identical transition columns share a class; class 0 is any char outside the alphabet
+            - all sink states collapse into state 0; states are stored premultiplied by the number of classes,
+              so the next state is table[state + class]
+            - accept[state] is 1 for final states
+        """
+        live = sorted(self.__states - self.__sink_states)
+        dense = {state: row for row, state in enumerate(live, 1)}  # any other state maps to 0
+
+        columns: Dict[Tuple[int, ...], int] = {}
+        self.__classes: Dict[str, int] = {}
+        for x in sorted(self.__alphabet):
+            column = tuple(dense.get(self.__next_state(state, x), 0) for state in live)
+            if column not in columns:
+                columns[column] = len(columns) + 1
+            self.__classes[x] = columns[column]
+
+        width = len(columns) + 1
+        self.__table = array('i', [0] * (width * (len(live) + 1)))
+        self.__accept = bytearray(len(self.__table))
+        for column, cls in columns.items():
+            for row, next_row in enumerate(column, 1):
+                self.__table[row * width + cls] = next_row * width
+        self.__labels: Dict[int, int] = {}
+        for state in self.__final_states:
+            self.__accept[dense[state] * width] = 1
+            self.__labels[dense[state] * width] = self.__tags.get(state, state)
+        self.__start = dense.get(self.__initial_state, 0) * width
+
+    def to_table(self) -> Tuple[Dict[str, int], array, bytearray, Dict[int, int], int]:
+        """@return (classes, table, accept, labels, start) -> the compiled form used for scanning, see __compile"""
+        return self.__classes, self.__table, self.__accept, self.__labels, self.__start
+
+    def to_byte_table(self) -> Tuple[array, bytearray, Dict[int, int], int]:
+        """
+            Same as to_table, with one column per byte value instead of the char classes, for scanning bytes directly.
+            Only possible if the alphabet is ASCII: a byte is then a char, and bytes above 127 are outside the alphabet.
+            @return (table, accept, labels, start) -> as in to_table, states premultiplied by 256
+        """
+        if any(len(x) == 1 and ord(x) > 127 for x in self.__classes):
+            raise ValueError('only a DFA over an ASCII alphabet can scan bytes')
+
+        width = max(self.__classes.values(), default=0) + 1
+        rows = len(self.__table) // width
+        byte_classes = [self.__classes.get(chr(byte), 0) for byte in range(256)]
+
+        table = array('i', [0] * (256 * rows))
+        accept = bytearray(len(table))
+        for row in range(rows):
+            for byte, cls in enumerate(byte_classes):
+                table[row * 256 + byte] = self.__table[row * width + cls] // width * 256
+            accept[row * 256] = self.__accept[row * width]
+        labels = {row // width * 256: tag for row, tag in self.__labels.items()}
+
+        return table, accept, labels, self.__start // width * 256
+
+    @staticmethod
+    def from_table(classes: Dict[str, int], table, accept, labels: Dict[int, int], start: int):
+        """
+            Rebuilds a DFA from the output of to_table; table and accept may be any int sequences (e.g. memoryviews
+            over a mapped file), used as they are for scanning. The transition dict is rebuilt only when needed.
+        """
+        dfa = DFA.__new__(DFA)
+        dfa.__classes = classes
+        dfa.__table = table
+        dfa.__accept = accept
+        dfa.__labels = labels
+        dfa.__start = start
+        dfa.__delta = None
+
+        return dfa
+
+    def __expand(self):
+        """Rebuilds the transition dict of a DFA created by from_table; its states are the table rows."""
+        if self.__delta is not None:
+            return
+
+        width = max(self.__classes.values(), default=0) + 1
+        rows = range(1, len(self.__table) // width)
+
+        self.__alphabet = set(self.__classes)
+        self.__initial_state = self.__start // width
+        self.__final_states = {row for row in rows if self.__accept[row * width]}
+        self.__tags = {row: self.__labels[row * width] for row in self.__final_states}
+        self.__delta = {
+            row: {
+                x: self.__table[row * width + cls] // width
+                for x, cls in self.__classes.items() if self.__table[row * width + cls]
+            } for row in rows
+        }
+        self.__states = set(rows) | {self.__initial_state}
+        self.__sink_states = {None} if self.__initial_state else {None, 0}
+
+    def states_count(self) -> int:
+        self.__expand()
+
+        return len(self.__states)
+
+    def minimize(self):
+        """
+            Hopcroft's partition refinement, O(n * k * log n)
+            @return an equivalent DFA with the minimum number of states
+        """
+        self.__expand()
+
+        # Only reachable states matter; missing transitions go to an explicit dead state (None)
+        reachable = [self.__initial_state]
+        seen = {self.__initial_state}
+        for state in reachable:
+            for x in self.__alphabet:
+                next_state = self.__next_state(state, x)
+                if next_state not in seen:
+                    seen.add(next_state)
+                    reachable.append(next_state)
+
+        alphabet = sorted(self.__alphabet)
+
+        # inverse[x][q] - states going to q on x
+        inverse: Dict[str, Dict[Union[None, int], List[Union[None, int]]]] = {x: {} for x in alphabet}
+        for state in reachable:
+            for x in alphabet:
+                inverse[x].setdefault(self.__next_state(state, x), []).append(state)
+
+        finals = {state for state in reachable if state in self.__final_states}
+        by_tag: Dict[int, Set[Union[None, int]]] = {}
+        for state in finals:
+            by_tag.setdefault(self.__tags.get(state), set()).add(state)
+        blocks: List[Set[Union[None, int]]] = [block for block in by_tag.values()]
+        if len(reachable) > len(finals):
+            blocks.append(set(reachable) - finals)
+        block_of = {state: i for i, block in enumerate(blocks) for state in block}
+
+        waiting = set(range(len(blocks)))
+        while waiting:
+            splitter = list(blocks[waiting.pop()])
+
+            for x in alphabet:
+                touched: Dict[int, Set[Union[None, int]]] = {}
+                for state in splitter:
+                    for prev_state in inverse[x].get(state, []):
+                        touched.setdefault(block_of[prev_state], set()).add(prev_state)
+
+                for block, part in touched.items():
+                    if len(part) == len(blocks[block]):
+                        continue
+
+                    blocks[block] -= part
+                    blocks.append(part)
+                    new_block = len(blocks) - 1
+                    for state in part:
+                        block_of[state] = new_block
+
+                    if block in waiting or len(part) <= len(blocks[block]):
+                        waiting.add(new_block)
+                    else:
+                        waiting.add(block)
+
+        # Renumber the blocks in BFS order; a block made only of the dead state is left implicit
+        def representative(block: int) -> Union[None, int]:
+            return next((state for state in blocks[block] if state is not None), None)
+
+        translate = {block_of[self.__initial_state]: 0}
+        queue = deque([block_of[self.__initial_state]])
+        delta = {}
+        while queue:
+            block = queue.popleft()
+            state = representative(block)
+            delta[translate[block]] = {}
+
+            for x in self.__delta.get(state, {}):
+                next_block = block_of[self.__delta[state][x]]
+                if representative(next_block) is None:
+                    continue
+
+                if next_block not in translate:
+                    translate[next_block] = len(translate)
+                    queue.append(next_block)
+                delta[translate[block]][x] = translate[next_block]
+
+        final_states = {translate[block_of[state]] for state in finals if block_of[state] in translate}
+        tags = {translate[block_of[state]]: self.__tags[state] for state in finals if state in self.__tags}
+
+        return DFA(self.__alphabet, 0, final_states, delta, tags)
+
+    @staticmethod
+    def product(dfas):
+        """
+            Runs all the DFAs in parallel: a state is the tuple of the component states.
+            @return a DFA accepting the union of the languages; every final state is tagged with the index
+            of the first DFA accepting in it
+        """
+        alphabet = set()
+        for dfa in dfas:
+            alphabet.update(dfa.__alphabet)
+
+        def tag(rows: Tuple[int, ...]) -> Union[None, int]:
+            return next((i for i, (dfa, row) in enumerate(zip(dfas, rows)) if dfa.__accept[row]), None)
+
+        initial = tuple(dfa.__start for dfa in dfas)
+        translate = {initial: 0}
+        queue = deque([initial])
+        delta = {}
+        tags = {}
+        while queue:
+            rows = queue.popleft()
+            state = translate[rows]
+            delta[state] = {}
+
+            if tag(rows) is not None:
+                tags[state] = tag(rows)
+
+            for x in alphabet:
+                next_rows = tuple(dfa.__table[row + dfa.__classes.get(x, 0)] for dfa, row in zip(dfas, rows))
+                if not any(next_rows):
+                    continue  # every DFA is in its sink
+
+                if next_rows not in translate:
+                    translate[next_rows] = len(translate)
+                    queue.append(next_rows)
+                delta[state][x] = translate[next_rows]
+
+        return DFA(alphabet, 0, set(tags), delta, tags)
 
     def __next_state(self, current_state: int, x: str):
         try:
@@ -85,6 +371,8 @@ class DFA:
             return None
 
     def __str__(self):
+        self.__expand()
+
         alphabet = ''.join(sorted([str(x) for x in self.__alphabet]))
         states_count = str(len(self.__states))
         initial_state = str(self.__initial_state)
@@ -97,3 +385,140 @@ class DFA:
         ])
 
         return alphabet + '\n' + states_count + '\n' + initial_state + '\n' + final_states + '\n' + transitions
+
+
+class LazyDFA:
+    """
+        A DFA over the subsets of an NFA (bitmasks) whose states and transitions are materialized only when a scan
+        first reaches them. At most cache_size states are kept: when the cache is full it is flushed, and if
+        flushes come too often (less than THRASHING chars scanned per cached state) the scans fall back to plain
+        NFA simulation, which costs a step per char but no memory.
+    """
+    CACHE_SIZE = 4096
+    THRASHING = 10
+
+    def __init__(self, initial_state: int, final_states: Dict[int, int], step: Callable[[int, str], int],
+                 cache_size: int = CACHE_SIZE):
+        """
+            @param initial_state - bitmask of the NFA states the scan starts from
+            @param final_states - NFA final state -> tag; a subset is tagged with the smallest tag of its finals
+            @param step - step(state_set, char) -> bitmask of the NFA states reached from state_set on char
+        """
+        self.__initial_state = initial_state
+        self.__final_states = sorted(final_states.items(), key=lambda item: item[1])
+        self.__step = step
+        self.__cache_size = max(cache_size, 2)
+        self.__simulating = False
+        self.__scanned = 0  # chars scanned since the last flush
+        self.__flush()
+
+    def __flush(self):
+        # row 0 is the empty set (the sink), row 1 the initial state set
+        self.__rows: Dict[int, int] = {}
+        self.__state_sets: List[int] = []
+        self.__delta: List[Dict[str, int]] = []
+        self.__tags: List[Union[None, int]] = []
+        self.__add(0)
+        self.__add(self.__initial_state)
+        self.__scanned = 0
+
+    def __add(self, state_set: int) -> int:
+        self.__rows[state_set] = len(self.__state_sets)
+        self.__state_sets.append(state_set)
+        self.__delta.append({})
+        self.__tags.append(self.__tag(state_set))
+
+        return len(self.__state_sets) - 1
+
+    def __tag(self, state_set: int) -> Union[None, int]:
+        return next((tag for state, tag in self.__final_states if state_set >> state & 1), None)
+
+    def __next_row(self, row: int, x: str, scanned: int) -> int:
+        """
+            Computes and caches a missing transition; may flush the cache, so only the returned row stays valid.
+            @param scanned - chars scanned by the current call so far
+        """
+        state_set = self.__state_sets[row]
+        to_state_set = self.__step(state_set, x)
+        to_row = self.__rows.get(to_state_set)
+
+        if to_row is None:
+            if len(self.__state_sets) >= self.__cache_size:
+                if self.__scanned + scanned < self.THRASHING * self.__cache_size:
+                    self.__simulating = True
+                self.__flush()
+                row = self.__rows.get(state_set)
+
+            to_row = self.__add(to_state_set)
+
+        if row is not None:
+            self.__delta[row][x] = to_row
+
+        return to_row
+
+    def states_count(self) -> int:
+        """@return the number of states currently cached"""
+        return len(self.__state_sets)
+
+    def check_word(self, word: str, start: int = 0, end: int = None) -> bool:
+        end = len(word) if end is None else end
+        if start == end:
+            return self.__tag(self.__initial_state) is not None
+
+        accepted, _, _ = self.longest_match(word, start, end)
+
+        return accepted == end - start
+
+    def max_accepted(self, word: str, start: int = 0, end: int = None) -> Tuple[int, int]:
+        accepted, last, _ = self.longest_match(word, start, end)
+
+        return accepted, last
+
+    def longest_match(self, word: str, start: int = 0, end: int = None) -> Tuple[int, int, Union[None, int]]:
+        """same as DFA.longest_match; the tag is the one of the NFA final states reached"""
+        end = len(word) if end is None else end
+
+        if self.__simulating:
+            return self.__simulate(word, start, end)
+
+        delta = self.__delta
+        tags = self.__tags
+        row = 1
+        accepted = start
+        accepted_tag = None
+        for i in range(start, end):
+            x = word[i]
+            next_row = delta[row].get(x)
+            if next_row is None:
+                next_row = self.__next_row(row, x, i - start)
+                if self.__simulating:
+                    return self.__simulate(word, start, end)
+                delta = self.__delta
+                tags = self.__tags
+            row = next_row
+
+            if tags[row] is not None:
+                accepted = i + 1
+                accepted_tag = tags[row]
+            elif not row:
+                self.__scanned += i - start
+                return accepted - start, i - start, accepted_tag
+
+        self.__scanned += end - start
+        return accepted - start, end - start, accepted_tag
+
+    def __simulate(self, word: str, start: int, end: int) -> Tuple[int, int, Union[None, int]]:
+        state_set = self.__initial_state
+        accepted = start
+        accepted_tag = None
+        for i in range(start, end):
+            state_set = self.__step(state_set, word[i])
+            tag = self.__tag(state_set)
+
+            if tag is not None:
+                accepted = i + 1
+                accepted_tag = tag
+            elif not state_set:
+                return accepted - start, i - start, accepted_tag
+
+        return accepted - start, end - start, accepted_tag
@@ -1,52 +1,62 @@
+from time import perf_counter
+from typing import Any, Dict, Union
+
+from .lexer import Lexer
 from .parser import Parser
-from .ast import Assign, Expr, While, InstructionList, If, Node
+from .ast import Node, depth
+from .compiler import compile_program
+from .resolver import resolve
+from .vm import assemble, execute
 
 
 class Interpreter:
-    def __init__(self, lexer_file: str):
-        self.__parser = Parser(lexer_file)
-
-    def interpret(self, program_file: str):
-        store = {}
-
-        def interpret_expr(expr: Expr) -> int:
-            # a + b + 2
-            if expr.type in 'iv':
-                return eval(expr.left, store.copy())
-
-            left = interpret_expr(expr.left)
-            right = interpret_expr(expr.right)
-
-            return eval('{} {} {}'.format(left, expr.type, right))
-
-        def interpret_while(ast: While):
-            while interpret_expr(ast.expr):
-                interpret_program(ast.prog)
-
-        def interpret_if(ast: If):
-            if interpret_expr(ast.expr):
-                interpret_program(ast.then_branch)
-            else:
-                interpret_program(ast.else_branch)
-
-        def interpret_instruction_list(ast: InstructionList):
-            for instruction in ast.list:
-                interpret_program(instruction)
-
-        def interpret_assign(ast: Assign):
-            store[ast.variable.left] = interpret_expr(ast.expr)
-
-        def interpret_program(ast: Node):
-            if isinstance(ast, Assign):
-                interpret_assign(ast)
-            elif isinstance(ast, If):
-                interpret_if(ast)
-            elif isinstance(ast, InstructionList):
-                interpret_instruction_list(ast)
-            elif isinstance(ast, While):
-                interpret_while(ast)
-
-        program = self.__parser.parse(program_file)
-        interpret_program(program)
+    # the compiled closures take Python frames for every level of nesting, both to compile and to run, so
+    # programs nested deeper than this run on the VM, whose assembler and loop do not
+    COMPILE_DEPTH = 200
+
+    def __init__(self, lexer: Union[str, Lexer], vm: bool = False):
+        """
+            @param lexer - a lexer specification file, or an already compiled Lexer
+            @param vm - run every program on the register bytecode machine, not only those nested deeper than
+            COMPILE_DEPTH; the closures are faster, this is for testing the VM
+        """
+        self.__parser = Parser(lexer)
+        self.__vm = vm
+
+    def interpret(self, program_file: str, stats: Dict[str, Any] = None):
+        """
+            @param stats - if given, filled with 'steps' (int: statements and conditions evaluated, or instructions
+            executed on the VM), 'parse_time' and 'run_time' (float, seconds), and 'warnings' (list of str: the
+            variables found, before running, to be read where they may not be assigned yet)
+        """
+        start = perf_counter()
+        ast = self.__parser.parse(program_file)
+
+        return self.__run(ast, stats, start)
+
+    def interpret_source(self, program: str, stats: Dict[str, Any] = None):
+        """same as interpret, for a program given as text"""
+        start = perf_counter()
+        ast = self.__parser.parse_string(program)
+
+        return self.__run(ast, stats, start)
+
+    def __run(self, ast: Node, stats: Dict[str, Any], start: float):
+        parsed = perf_counter()
+        steps = [0] if stats is not None else None
+        resolution = resolve(ast)
+
+        if self.__vm or depth(ast) > self.COMPILE_DEPTH:
+            store = execute(assemble(ast, resolution), steps)
+        else:
+            slots = resolution.new_store()
+
+            program = compile_program(ast, steps, resolution)
+            program(slots)
+            store = resolution.to_dict(slots)
+
+        if stats is not None:
+            stats.update(steps=steps[0], parse_time=parsed - start, run_time=perf_counter() - parsed,
+                         warnings=resolution.warnings)
 
         return store
@@ -1,7 +1,70 @@
-from functools import reduce
-from typing import List, Tuple, Union
+import codecs
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from enum import IntEnum
+from typing import Dict, List, Tuple, Iterator, IO, Iterable, Type, Union
 
-from .dfa import DFA
+from .dfa import DFA, LazyDFA
+from .nfa import NFABuilder
+from .regex import Regex
+
+
+class LineIndex:
+    """Offsets of the line starts of a text, built once; maps an offset to (line, column) in O(log n)."""
+
+    def __init__(self, text: str):
+        self.__length = len(text)
+        self.__starts = array('l', [0])
+
+        newline = text.find('\n')
+        while newline != -1:
+            self.__starts.append(newline + 1)
+            newline = text.find('\n', newline + 1)
+
+    def locate(self, offset: int) -> Tuple[int, int]:
+        line = bisect_right(self.__starts, offset) - 1
+
+        return line, offset - self.__starts[line]
+
+    def error(self, offset: int):
+        """@return the ParseException for a lexing error at offset (EOF if offset is the end of the text)"""
+        line, column = self.locate(offset)
+
+        return Lexer.ParseException(line, -1 if offset == self.__length else column)
+
+
+class TokenStream:
+    """
+        Compact token list: kinds as small ints (values of Lexer.token_kinds) and spans as parallel arrays of offsets
+        into the source text, 9 bytes per token; the text of a token is sliced only when asked for.
+    """
+
+    def __init__(self, source: str, kind: Type[IntEnum]):
+        self.source = source
+        self.kind = kind  # the enum of the token kinds
+        self.kinds = array('B' if len(kind) <= 256 else 'H')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def text(self, i: int) -> str:
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def __getitem__(self, i: int) -> Tuple[IntEnum, str]:
+        return self.kind(self.kinds[i]), self.text(i)
+
+    def __iter__(self) -> Iterator[Tuple[IntEnum, str]]:
+        return (self[i] for i in range(len(self)))
 
 
 class Lexer:
@@ -16,46 +79,453 @@ class Lexer:
             return 'No viable alternative at character {}, line {}'.format(position, self.line)
 
     def __init__(self, dfas: List[Tuple[str, DFA]]):
-        self.__dfas = dfas
+        # A single automaton runs all the token DFAs at once; its final states are tagged with the index of
+        # the first listed token accepting there, so ties keep going to the first token in the list
+        self.__setup([token for token, _ in dfas], DFA.product([dfa for _, dfa in dfas]).minimize())
 
-    def parse(self, text: str) -> List[Tuple[str, str]]:
-        # Reducer for iterating trough a list of (token, DFA) and get dfa which accepts max len word
-        def reducer(acc: Tuple[Union[str, None], int, int], x: Tuple[str, DFA]):
-            max_token, max_accepted, max_read = acc
-            token, dfa = x
-            accepted, last = dfa.max_accepted(text[position:])
+    def __setup(self, tokens: List[str], dfa: Union[DFA, LazyDFA]):
+        self.__tokens = tokens
+        self.__dfa = dfa
+        self.__byte_lexer = None
+        self.__kinds = None  # built on first use by token_kinds: not every token list is a valid enum
+
+    @staticmethod
+    def from_regexes(regexes: List[Tuple[str, Regex]], lazy: bool = False,
+                     cache_size: int = LazyDFA.CACHE_SIZE) -> 'Lexer':
+        """
+            @param lazy - instead of building every DFA up front, run a LazyDFA over the union of the token NFAs,
+            whose final states are tagged with the index of their token
+        """
+        if not lazy:
+            return Lexer([(token, regex.to_nfa().to_dfa(minimize=True)) for token, regex in regexes])
+
+        builder = NFABuilder()
+        fragments = [regex.build(builder) for _, regex in regexes]
+        initial_state = builder.alternatives(fragments)
+        final_states = {}
+        for tag, (_, final_state) in enumerate(fragments):
+            final_states.setdefault(final_state, tag)
+        nfa = builder.to_nfa((initial_state, fragments[0][1]))
+
+        lexer = Lexer.__new__(Lexer)
+        lexer.__setup([token for token, _ in regexes], nfa.to_lazy_dfa(cache_size, final_states))
+
+        return lexer
+
+    @staticmethod
+    def from_spec(text: str, lazy: bool = False, cache_size: int = LazyDFA.CACHE_SIZE) -> 'Lexer':
+        """
+            @param text - one "<TOKEN> <regex>;" per line, the first listed token winning ties
+            @param lazy, cache_size - see from_regexes
+        """
+        regexes = []
+        for line in text.split(';\n'):
+            if not line:
+                continue
+            token, regex = line.split(' ', maxsplit=1)
+
+            regexes.append((token, Regex.parse(regex)))
+
+        return Lexer.from_regexes(regexes, lazy, cache_size)
+
+    # Binary layout used by dump/load, all integers little endian:
+    # header (magic, start, number of table cells, metadata length) | json metadata (tokens, classes, labels) |
+    # padding to 4 bytes | table as int32 cells | accept as one byte per cell
+    MAGIC = b'LEXDFA01'
+    HEADER = struct.Struct('<8sIII')
+
+    def dump(self, file: IO):
+        """Writes the compiled automaton to a binary file, see load."""
+        if not isinstance(self.__dfa, DFA):
+            raise ValueError('only a lexer backed by a DFA can be saved')
+
+        classes, table, accept, labels, start = self.__dfa.to_table()
+        metadata = json.dumps({
+            'tokens': self.__tokens,
+            'classes': classes,
+            'labels': sorted(labels.items()),
+        }).encode('utf-8')
+
+        table = array('i', table)
+        if sys.byteorder != 'little':
+            table.byteswap()
+
+        file.write(self.HEADER.pack(self.MAGIC, start, len(table), len(metadata)))
+        file.write(metadata)
+        file.write(bytes(-(self.HEADER.size + len(metadata)) % 4))
+        file.write(table.tobytes())
+        file.write(bytes(accept))
+
+    @staticmethod
+    def load(buffer) -> 'Lexer':
+        """
+            Reads a lexer written by dump from a bytes-like object; with a mmap the transition table is used
+            in place, without copying it.
+        """
+        magic, start, cells, metadata_length = Lexer.HEADER.unpack_from(buffer)
+        if magic != Lexer.MAGIC:
+            raise ValueError('not a compiled lexer')
 
-            if accepted > max_accepted:
-                return token, accepted, last
-            if last > max_read:
-                return max_token, max_accepted, last
+        view = memoryview(buffer)
+        offset = Lexer.HEADER.size
+        metadata = json.loads(bytes(view[offset:offset + metadata_length]).decode('utf-8'))
+        offset += metadata_length + -(offset + metadata_length) % 4
 
-            return acc
+        if len(view) < offset + 5 * cells:
+            raise ValueError('truncated compiled lexer')
 
+        table = view[offset:offset + 4 * cells].cast('i')
+        if sys.byteorder != 'little':
+            table = array('i', table)
+            table.byteswap()
+        accept = view[offset + 4 * cells:offset + 5 * cells]
+
+        dfa = DFA.from_table(metadata['classes'], table, accept, dict(metadata['labels']), start)
+        lexer = Lexer.__new__(Lexer)
+        lexer.__setup(metadata['tokens'], dfa)
+
+        return lexer
+
+    def to_byte_lexer(self) -> 'ByteLexer':
+        """@return the same lexer scanning bytes, see ByteLexer; ValueError if it is lazy or its alphabet not ASCII"""
+        if self.__byte_lexer is None:
+            if not isinstance(self.__dfa, DFA):
+                raise ValueError('only a lexer backed by a DFA can scan bytes')
+
+            self.__byte_lexer = ByteLexer(self.__tokens, *self.__dfa.to_byte_table())
+
+        return self.__byte_lexer
+
+    def lex_file(self, file_name: str) -> Iterator[Tuple[str, str]]:
+        """
+            Lexes a file, as memory mapped bytes if the lexer can scan bytes and the file has no '\\r' (the byte path
+            does no newline translation), else as a stream of utf-8 text read like open() does.
+            @return generator of (token, word)
+        """
+        try:
+            byte_lexer = self.to_byte_lexer()
+        except ValueError:
+            byte_lexer = None
+
+        if byte_lexer is not None:
+            with ByteLexer.map_file(file_name) as data:
+                if data.find(b'\r') == -1:
+                    for token_id, start, end in byte_lexer.spans(data):
+                        yield byte_lexer.tokens[token_id], data[start:end].decode('ascii')
+                    return
+
+        with open(file_name, 'r') as source:
+            for token, word, _, _ in self.iter_tokens(source):
+                yield token, word
+
+    def parse(self, text: str) -> List[Tuple[str, str]]:
         position = 0
         tokens: List[Tuple[str, str]] = []
 
         while position < len(text):
             # accepted - nr of chars from accepted word | last - index of max checked char
-            token, accepted, last = reduce(reducer, self.__dfas, (None, 0, 0))
+            accepted, last, tag = self.__dfa.longest_match(text, position)
+
+            if not accepted:
+                raise LineIndex(text).error(position + last)
+
+            tokens.append((self.__tokens[tag], text[position:position + accepted]))
+            position += accepted
+
+        return tokens
+
+    # parse_parallel: chars per chunk, and how far past the end of its chunk a worker may read
+    CHUNK_SIZE = 1 << 20
+    LOOKAHEAD = 1 << 12
+
+    def scan(self, text: str, limit: int, complete: bool = True) -> Tuple[array, array, array, int, int]:
+        """
+            Lexes text from its start for as long as tokens start before limit, without raising on errors.
+            @param complete - False if text is only a prefix of the input: a token (or error) whose scan reaches
+            the end of text is left undecided and the scan stops before it
+            @return (starts, ends, tags, stop, error) -> the tokens found, as parallel arrays | position where
+            the scan stopped | offset of the lexing error of the token at stop, -1 if there is none
+        """
+        starts, ends, tags = array('l'), array('l'), array('l')
+        position = 0
+
+        while position < limit and position < len(text):
+            accepted, last, tag = self.__dfa.longest_match(text, position)
+
+            if not complete and position + last == len(text):
+                break
+
+            if not accepted:
+                return starts, ends, tags, position, position + last
+
+            starts.append(position)
+            ends.append(position + accepted)
+            tags.append(tag)
+            position += accepted
+
+        return starts, ends, tags, position, -1
+
+    def parse_parallel(self, text: str, workers: int = None, chunk_size: int = CHUNK_SIZE) -> List[Tuple[str, str]]:
+        """
+            Same as parse, splitting the text in chunks lexed speculatively by a pool of processes: each worker
+            assumes a token starts at the beginning of its chunk. Chunks are then stitched in order; where the
+            position reached so far is not a token start found by the next worker, tokens are lexed sequentially
+            until the two streams meet again, so the result (and the error raised) is the one of parse.
+            Lexers backed by a LazyDFA are not shipped to workers and lex sequentially.
+            @param workers - number of processes, default one per core
+        """
+        if not isinstance(self.__dfa, DFA) or len(text) <= chunk_size:
+            return self.parse(text)
+
+        bounds = range(0, len(text), chunk_size)
+        jobs = [
+            (text[base:base + chunk_size + self.LOOKAHEAD], chunk_size, base + chunk_size + self.LOOKAHEAD >= len(text))
+            for base in bounds
+        ]
+        compiled = io.BytesIO()
+        self.dump(compiled)
+
+        tokens: List[Tuple[str, str]] = []
+        position = 0
+
+        def lex_token():
+            nonlocal position
 
-            if not token:
-                position += last
-                line_count = -1
-                is_eof = position == len(text)
+            accepted, last, tag = self.__dfa.longest_match(text, position)
+            if not accepted:
+                raise LineIndex(text).error(position + last)
+
+            tokens.append((self.__tokens[tag], text[position:position + accepted]))
+            position += accepted
 
-                for line in text.split('\n'):
-                    line_count += 1
-                    if position < len(line):
+        with ProcessPoolExecutor(workers, initializer=init_chunk_worker, initargs=(compiled.getvalue(),)) as executor:
+            for base, (starts, ends, tags, stop, error) in zip(bounds, executor.map(scan_chunk, jobs)):
+                while position < base + stop:
+                    i = bisect_left(starts, position - base)
+                    if i < len(starts) and starts[i] == position - base:
+                        # in sync: from here on the worker lexed exactly what parse would have
+                        tokens.extend([
+                            (self.__tokens[tags[j]], text[base + starts[j]:base + ends[j]]) for j in range(i, len(starts))
+                        ])
+                        position = base + stop
                         break
-                    position -= len(line)
 
-                if is_eof:
-                    position = -1
+                    lex_token()
+
+                if error != -1 and position == base + stop:
+                    raise LineIndex(text).error(base + error)
+
+        while position < len(text):
+            lex_token()
+
+        return tokens
+
+    def token_kinds(self) -> Type[IntEnum]:
+        """
+            @return enum of the token names, valued by their index in the specification; ValueError if the names
+            can not make one (a repeated name, or one reserved by Enum)
+        """
+        if self.__kinds is None:
+            try:
+                self.__kinds = IntEnum('TokenKind', self.__tokens, start=0)
+            except (TypeError, ValueError) as err:
+                raise ValueError('token names {} are not valid enum members: {}'.format(self.__tokens, err)) from None
+
+        return self.__kinds
+
+    def token_stream(self, text: str, skip: Iterable[str] = ()) -> TokenStream:
+        """same as parse, into a TokenStream; tokens named in skip (if the lexer has them) are dropped while lexing"""
+        stream = TokenStream(text, self.token_kinds())
+        kinds, starts, ends = stream.kinds, stream.starts, stream.ends
+        skipped = {tag for tag, token in enumerate(self.__tokens) if token in skip}
+        position = 0
+
+        while position < len(text):
+            accepted, last, tag = self.__dfa.longest_match(text, position)
 
-                raise Lexer.ParseException(line_count, position)
+            if not accepted:
+                raise LineIndex(text).error(position + last)
 
-            tokens.append((token, text[position:position + accepted]))
+            if tag not in skipped:
+                kinds.append(tag)
+                starts.append(position)
+                ends.append(position + accepted)
             position += accepted
 
+        return stream
+
+    def tokenize(self, text: str) -> List[Tuple[str, str, int, int]]:
+        """same as parse, with positions: @return list of (token, word, line, column), both from 0"""
+        tokens, _ = self.__tokenize(text, False)
+
         return tokens
+
+    def diagnose(self, text: str) -> Tuple[List[Tuple[str, str, int, int]], List[ParseException]]:
+        """
+            Lexes the whole text, recovering from errors by dropping the chars read up to the error
+            (at least one) and starting a new token after them.
+            @return (tokens, errors) -> tokens as in tokenize | every error found, in order
+        """
+        return self.__tokenize(text, True)
+
+    def __tokenize(self, text: str, recover: bool) -> Tuple[List[Tuple[str, str, int, int]], List[ParseException]]:
+        index = LineIndex(text)
+        position = 0
+        tokens: List[Tuple[str, str, int, int]] = []
+        errors: List[Lexer.ParseException] = []
+
+        while position < len(text):
+            accepted, last, tag = self.__dfa.longest_match(text, position)
+
+            if not accepted:
+                if not recover:
+                    raise index.error(position + last)
+
+                # last is the offset of the character the DFA got stuck on: resume right after it
+                errors.append(index.error(position + last))
+                position += min(last + 1, len(text) - position)
+                continue
+
+            tokens.append((self.__tokens[tag], text[position:position + accepted]) + index.locate(position))
+            position += accepted
+
+        return tokens, errors
+
+    def iter_tokens(self, stream: IO, chunk_size: int = 1 << 16) -> Iterator[Tuple[str, str, int, int]]:
+        """
+            Lexes a text or binary (utf-8) file incrementally, keeping in memory only the current token and the
+            chunk being scanned; a token straddling a chunk boundary is rescanned once the next chunk is read.
+            @return generator of (token, word, line, column), line and column of the first char, both from 0
+        """
+        decoder = None
+        buffer = ''
+        position = 0
+        eof = False
+        line, column = 0, 0
+
+        while True:
+            accepted, last, tag = self.__dfa.longest_match(buffer, position)
+
+            if position + last == len(buffer) and not eof:
+                # the scan reached the end of the buffer: the token may go on in the next chunk
+                chunk: Union[str, bytes] = stream.read(chunk_size)
+                eof = not chunk
+                if isinstance(chunk, bytes):
+                    decoder = decoder or codecs.getincrementaldecoder('utf-8')()
+                    chunk = decoder.decode(chunk, final=eof)
+
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+
+            if position == len(buffer):
+                return
+
+            if not accepted:
+                # the char at which every DFA got stuck, or EOF if the input ran out first
+                if position + last == len(buffer):
+                    raise Lexer.ParseException(line + buffer.count('\n', position), -1)
+
+                newlines = buffer.count('\n', position, position + last)
+                if newlines:
+                    column = position + last - buffer.rfind('\n', position, position + last) - 1
+                else:
+                    column += last
+                raise Lexer.ParseException(line + newlines, column)
+
+            word = buffer[position:position + accepted]
+            yield self.__tokens[tag], word, line, column
+
+            newlines = word.count('\n')
+            if newlines:
+                line += newlines
+                column = len(word) - word.rfind('\n') - 1
+            else:
+                column += accepted
+            position += accepted
+
+
+class ByteLexer:
+    """
+        Lexer over bytes (e.g. a memory mapped file) with one table column per byte value, built by
+        Lexer.to_byte_lexer. Tokens are (token_id, start, end) offsets; their text is decoded only by whoever needs it.
+        As the alphabet is ASCII, every byte before a token end or an error is a char, so offsets are char offsets.
+    """
+
+    def __init__(self, tokens: List[str], table: array, accept: bytearray, labels: Dict[int, int], start: int):
+        self.tokens = tokens  # token_id -> token name
+        self.__table = table
+        self.__accept = accept
+        self.__labels = labels
+        self.__start = start
+
+    @staticmethod
+    @contextmanager
+    def map_file(file_name: str):
+        """@return context manager giving a read only mmap of the file (empty bytes for an empty file)"""
+        with open(file_name, 'rb') as file:
+            if not os.fstat(file.fileno()).st_size:
+                yield b''
+                return
+
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                yield data
+
+    def spans(self, data, start: int = 0, end: int = None) -> Iterator[Tuple[int, int, int]]:
+        """
+            Lexes data[start:end] (any bytes-like object), longest match first.
+            @return generator of (token_id, start, end) -> offsets in data; ParseException on the first error
+        """
+        table = self.__table
+        accept = self.__accept
+        labels = self.__labels
+        end = len(data) if end is None else end
+        position = start
+
+        while position < end:
+            state = self.__start
+            accepted = position
+            accepted_state = 0
+            i = position
+            while i < end:
+                state = table[state + data[i]]
+                i += 1
+
+                if accept[state]:
+                    accepted = i
+                    accepted_state = state
+                elif not state:
+                    i -= 1  # the byte that led to the sink is the one reported
+                    break
+
+            if accepted == position:
+                raise ByteLexer.error(data, i)
+
+            yield labels[accepted_state], position, accepted
+            position = accepted
+
+    @staticmethod
+    def error(data, offset: int) -> Lexer.ParseException:
+        """same as LineIndex.error, counting the lines of data up to offset"""
+        line, line_start = 0, 0
+        newline = data.find(b'\n', 0, offset)
+        while newline != -1:
+            line += 1
+            line_start = newline + 1
+            newline = data.find(b'\n', line_start, offset)
+
+        return Lexer.ParseException(line, -1 if offset == len(data) else offset - line_start)
+
+
+# lexer of a parse_parallel worker process, set once by init_chunk_worker
+chunk_lexer: Lexer = None
+
+
+def init_chunk_worker(compiled_lexer: bytes):
+    global chunk_lexer
+
+    chunk_lexer = Lexer.load(compiled_lexer)
+
+
+def scan_chunk(job: Tuple[str, int, bool]) -> Tuple[array, array, array, int, int]:
+    return chunk_lexer.scan(*job)
@@ -1,7 +1,8 @@
+from array import array
 from collections import deque
 from typing import Set, Dict, Tuple, List
 
-from .dfa import DFA
+from .dfa import DFA, LazyDFA
 
 EPSILON = 'EPSILON'
 
@@ -97,87 +98,107 @@ class NFA:
         return NFA(self.__alphabet, self.__initial_state + count,
                    self.__final_state + count, self.__states_count, delta)
 
-    def to_dfa(self) -> DFA:
-        def compute_epsilon_closure() -> Dict[int, Set[int]]:
-            def get_epsilon_closure(state: int):
-                states = set()
-                queue = deque([state])
-                while queue:
-                    from_state = queue.popleft()
-                    states.add(from_state)
-
-                    if from_state not in self.__delta or EPSILON not in self.__delta[from_state]:
-                        continue
-
-                    queue.extend([
-                        to_state
-                        for to_state in self.__delta[from_state][EPSILON] if to_state not in states
-                    ])
-
-                return states
-
-            return {i: get_epsilon_closure(i) for i in range(self.__states_count)}
-
-        def set_to_state(state_set: Set[int]) -> str:
-            return ','.join([str(x) for x in state_set])
-
-        def normalize(initial_state: str, final_states: Set[str], delta: Dict[str, Dict[str, str]]) ->\
-                Tuple[int, Set[int], Dict[int, Dict[str, int]]]:
-            states = {initial_state}
-            states.update(final_states)
-            states.update({state for state in delta})
-            states.update({delta[state][char] for state in delta for char in delta[state]})
-
-            translate = {old_name: new_name for new_name, old_name in enumerate(states)}
-
-            new_delta = {
-                translate[state]: {
-                    char: translate[delta[state][char]] for char in delta[state]
-                } for state in delta
-            }
-
-            new_initial_state = translate[initial_state]
-            new_final_states = {translate[x] for x in final_states}
-
-            return new_initial_state, new_final_states, new_delta
-
-        epsilon_closure = compute_epsilon_closure()
+    def __epsilon_closures(self) -> List[int]:
+        """@return closures[state] - the epsilon closure of state, as a bitmask over the NFA states"""
+        closures = []
+
+        for state in range(self.__states_count):
+            closure = 1 << state
+            stack = [state]
+            while stack:
+                from_state = stack.pop()
+                for to_state in self.__delta.get(from_state, {}).get(EPSILON, []):
+                    if not closure >> to_state & 1:
+                        closure |= 1 << to_state
+                        stack.append(to_state)
+
+            closures.append(closure)
+
+        return closures
+
+    def __moves(self, closures: List[int]) -> Dict[str, Tuple[int, Dict[int, int]]]:
+        """
+            @return moves[char] = (sources, targets) -> sources - bitmask of the states with a transition on char |
+            targets[state] - bitmask of the epsilon closure of everything reachable from state on char
+        """
+        moves = {char: (0, {}) for char in self.__alphabet}
+
+        for from_state in self.__delta:
+            for char, to_states in self.__delta[from_state].items():
+                if char == EPSILON:
+                    continue
+
+                sources, targets = moves[char]
+                mask = 0
+                for to_state in to_states:
+                    mask |= closures[to_state]
+                targets[from_state] = mask
+                moves[char] = sources | 1 << from_state, targets
+
+        return moves
+
+    @staticmethod
+    def __move(state_set: int, move: Tuple[int, Dict[int, int]]) -> int:
+        """@return the bitmask of the states reached from the bitmask state_set on one char"""
+        sources, targets = move
+        state_set &= sources
+        to_state_set = 0
+
+        while state_set:
+            low = state_set & -state_set
+            to_state_set |= targets[low.bit_length() - 1]
+            state_set ^= low
+
+        return to_state_set
+
+    def to_dfa(self, minimize: bool = False) -> DFA:
+        """Subset construction; a DFA state is a bitmask over the NFA states, the empty set being the sink"""
+        closures = self.__epsilon_closures()
+        moves = self.__moves(closures)
+        alphabet = sorted(self.__alphabet)
+        final_mask = 1 << self.__final_state
+
+        initial_state_set = closures[self.__initial_state]
+        translate = {initial_state_set: 0}
+        queue = deque([initial_state_set])
         delta = {}
         final_states = set()
-        sink_state = self.__states_count
 
-        queue = deque([epsilon_closure[self.__initial_state]])
-        visited = {set_to_state(epsilon_closure[self.__initial_state])}
         while queue:
             from_state_set = queue.popleft()
-            from_state = set_to_state(from_state_set)
+            from_state = translate[from_state_set]
             delta[from_state] = {}
 
-            if self.__final_state in from_state_set:
+            if from_state_set & final_mask:
                 final_states.add(from_state)
 
-            for char in self.__alphabet:
-                to_state_set = {
-                    item
+            for char in alphabet:
+                to_state_set = self.__move(from_state_set, moves[char])
 
-                    for nfa_state in from_state_set if nfa_state in self.__delta and char in self.__delta[nfa_state]
-                    for another_state in self.__delta[nfa_state][char]
-                    for item in epsilon_closure[another_state]
-                } or {sink_state}
+                if to_state_set not in translate:
+                    translate[to_state_set] = len(translate)
+                    queue.append(to_state_set)
 
-                to_state = set_to_state(to_state_set)
+                delta[from_state][char] = translate[to_state_set]
 
-                delta[from_state][char] = to_state
+        dfa = DFA(self.__alphabet, 0, final_states, delta)
 
-                if to_state not in visited:
-                    visited.add(to_state)
-                    queue.append(to_state_set)
+        return dfa.minimize() if minimize else dfa
 
-        initial_state = set_to_state(epsilon_closure[self.__initial_state])
+    def to_lazy_dfa(self, cache_size: int = LazyDFA.CACHE_SIZE, final_states: Dict[int, int] = None) -> LazyDFA:
+        """
+            @param final_states - final state -> tag, to accept in more than one state (default: the final state,
+            tagged with itself)
+        """
+        closures = self.__epsilon_closures()
+        moves = self.__moves(closures)
 
-        initial_state, final_states, delta = normalize(initial_state, final_states, delta)
+        def step(state_set: int, char: str) -> int:
+            return NFA.__move(state_set, moves[char]) if char in moves else 0
 
-        return DFA(self.__alphabet, initial_state, final_states, delta)
+        final_states = final_states or {self.__final_state: self.__final_state}
+
+        return LazyDFA(closures[self.__initial_state], final_states, step, cache_size)
 
     def __str__(self):
         result = 'from,char,to\n'
@@ -191,3 +212,81 @@ class NFA:
         ])
 
         return result
+
+
+class NFABuilder:
+    """
+        Builds a Thompson NFA in one pass over a regex: states come from a shared counter and every edge is
+        appended to parallel arrays, so no fragment is ever renumbered or copied.
+        A fragment is the (initial_state, final_state) pair of a sub-automaton.
+    """
+
+    def __init__(self):
+        self.__states_count = 0
+        self.__alphabet: Set[str] = set()
+        self.__sources = array('l')
+        self.__targets = array('l')
+        self.__chars: List[str] = []
+
+    def __new_state(self) -> int:
+        self.__states_count += 1
+
+        return self.__states_count - 1
+
+    def __edge(self, from_state: int, char: str, to_state: int):
+        self.__sources.append(from_state)
+        self.__chars.append(char)
+        self.__targets.append(to_state)
+
+    def char(self, char: str) -> Tuple[int, int]:
+        initial_state, final_state = self.__new_state(), self.__new_state()
+        self.__edge(initial_state, char, final_state)
+        self.__alphabet.add(char)
+
+        return initial_state, final_state
+
+    def union(self, a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+        initial_state, final_state = self.__new_state(), self.__new_state()
+        self.__edge(initial_state, EPSILON, a[0])
+        self.__edge(initial_state, EPSILON, b[0])
+        self.__edge(a[1], EPSILON, final_state)
+        self.__edge(b[1], EPSILON, final_state)
+
+        return initial_state, final_state
+
+    def concat(self, a: Tuple[int, int], b: Tuple[int, int]) -> Tuple[int, int]:
+        self.__edge(a[1], EPSILON, b[0])
+
+        return a[0], b[1]
+
+    def star(self, a: Tuple[int, int]) -> Tuple[int, int]:
+        initial_state, final_state = self.__new_state(), self.__new_state()
+        self.__edge(initial_state, EPSILON, a[0])
+        self.__edge(initial_state, EPSILON, final_state)
+        self.__edge(a[1], EPSILON, a[0])
+        self.__edge(a[1], EPSILON, final_state)
+
+        return initial_state, final_state
+
+    def plus(self, a: Tuple[int, int]) -> Tuple[int, int]:
+        # a+ loops back on a itself instead of concatenating a copy of a with a*
+        final_state = self.__new_state()
+        self.__edge(a[1], EPSILON, a[0])
+        self.__edge(a[1], EPSILON, final_state)
+
+        return a[0], final_state
+
+    def alternatives(self, fragments: List[Tuple[int, int]]) -> int:
+        """@return a new state with epsilon transitions to the initial states of all the fragments"""
+        initial_state = self.__new_state()
+        for fragment in fragments:
+            self.__edge(initial_state, EPSILON, fragment[0])
+
+        return initial_state
+
+    def to_nfa(self, fragment: Tuple[int, int]) -> NFA:
+        delta: Dict[int, Dict[str, List[int]]] = {}
+        for from_state, char, to_state in zip(self.__sources, self.__chars, self.__targets):
+            delta.setdefault(from_state, {}).setdefault(char, []).append(to_state)
+
+        return NFA(set(self.__alphabet), fragment[0], fragment[1], self.__states_count, delta)
@@ -1,126 +1,130 @@
+from typing import List, Union
+
 from .lexer import Lexer
-from .regex import Regex
+from .cache import load_lexer
+from .arena import Arena
 from .ast import *
 
+# binding strength of the binary operators: comparisons lowest, then + and -, then *
+PRECEDENCE = {'>': 1, '<': 1, '==': 1, '+': 2, '-': 2, '*': 3}
 
-class Parser:
-    def __init__(self, lexer_file: str):
-        def parse_lexer(text: str) -> Lexer:
-            dfas = []
-            for line in text.split(';\n'):
-                if not line:
-                    continue
-                token, regex = line.split(' ', maxsplit=1)
-
-                dfa = Regex.parse(regex).to_nfa().to_dfa()
-
-                dfas.append((token, dfa))
-
-            return Lexer(dfas)
 
-        with open(lexer_file, 'r') as file:
-            self.__lexer = parse_lexer(file.read())
+class Parser:
+    def __init__(self, lexer: Union[str, Lexer]):
+        """@param lexer - a lexer specification file, or an already compiled Lexer"""
+        self.__lexer = lexer if isinstance(lexer, Lexer) else load_lexer(lexer, Lexer.from_spec)
 
-    def parse(self, program_file: str) -> Node:
+    def parse(self, program_file: str, arena: bool = False) -> Union[Node, Arena]:
+        """@param arena - build the program as an Arena instead of a tree of Node objects"""
         with open(program_file, 'r') as file:
-            program = file.read()
+            return self.parse_string(file.read(), arena)
 
-        tokens = [x for x in self.__lexer.parse(program) if x[0] not in {'WHITESPACES', 'PARENTHESES'}]
+    def parse_string(self, program: str, arena: bool = False) -> Union[Node, Arena]:
+        build = Arena() if arena else TreeBuilder
+        tokens = self.__lexer.token_stream(program, skip=('WHITESPACES', 'PARENTHESES'))
+        kinds = tokens.kinds
+        kind = tokens.kind
         index = 0
 
-        def parse_operand(height: int) -> Node:
+        def parse_operand() -> Node:
             nonlocal index
 
-            if tokens[index][0] == 'INTEGER':
-                node = Expr(height, 'i', tokens[index][1])
-            elif tokens[index][0] == 'VARIABLE':
-                node = Expr(height, 'v', tokens[index][1])
+            if kinds[index] == kind.INTEGER:
+                node = build.add_expr('i', tokens.text(index))
+            elif kinds[index] == kind.VARIABLE:
+                node = build.add_expr('v', tokens.text(index))
             else:
                 raise Exception()
             index += 1
 
             return node
 
-        def parse_expr(height) -> Node:
+        def parse_expr(min_precedence: int = 1) -> Node:
+            """
+                Precedence climbing, in a single pass: operators bind left to right, those of a higher precedence
+                first; recursion only goes as deep as the number of precedence levels
+            """
             nonlocal index
 
-            if tokens[index + 1][0] != 'OPERATOR':
-                return parse_operand(height)
-
-            operators = 0
-            i = index + 1
-            while i < len(tokens):
-                if tokens[i][0] == 'OPERATOR':
-                    operators += 1
-                    i += 1
-                else:
+            node = parse_operand()
+            while index < len(tokens) and kinds[index] == kind.OPERATOR:
+                operator = tokens.text(index)
+                precedence = PRECEDENCE[operator]
+                if precedence < min_precedence:
                     break
-
-            height += operators - 1
-
-            a = parse_operand(height + 1)
-            operator = tokens[index][1]
-            index += 1
-            b = parse_operand(height + 1)
-
-            node = Expr(height, operator, a, b)
-
-            while index < len(tokens) and tokens[index][0] == 'OPERATOR':
-                height -= 1
-                operator = tokens[index][1]
                 index += 1
-                operand = parse_operand(height + 1)
 
-                node = Expr(height, operator, node, operand)
+                node = build.add_expr(operator, node, parse_expr(precedence + 1))
 
             return node
 
-        def parse_ast(height: int = 0) -> Node:
+        def parse_ast() -> Node:
+            """
+                Statements are parsed with an explicit stack of the compound statements still open, so the
+                nesting depth of a program is not bounded by the Python call stack
+            """
             nonlocal index
 
-            while index < len(tokens):
-                if tokens[index][0] == 'BEGIN':
-                    instructions = []
-                    index += 1
-                    while tokens[index][0] != 'END':
-                        instructions.append(parse_ast(height + 1))
-
+            # [kind of the open statement, the nodes parsed for it so far]
+            open_statements: List[list] = []
+            while True:
+                # go down to the first statement that needs no other statement
+                if index >= len(tokens):
+                    node = None
+                elif kinds[index] == kind.BEGIN:
+                    index += 1  # escape BEGIN
+                    if kinds[index] != kind.END:
+                        open_statements.append([kind.BEGIN, []])
+                        continue
+
+                    index += 1  # escape END
+                    node = build.add_instruction_list([])
+                elif kinds[index] == kind.WHILE or kinds[index] == kind.IF:
+                    statement = kinds[index]
+                    index += 1  # escape WHILE / IF
+
+                    condition = parse_expr()
+                    index += 1  # escape DO / THEN
+
+                    open_statements.append([statement, [condition]])
+                    continue
+                elif kinds[index] == kind.VARIABLE and kinds[index + 1] == kind.EQUAL:
+                    variable = parse_operand()
                     index += 1
-                    return InstructionList(height, instructions)
-
-                if tokens[index][0] == 'WHILE':
-                    index += 1  # escape WHILE
-
-                    condition = parse_expr(height + 1)
-                    index += 1  # escape DO
-
-                    program = parse_ast(height + 1)
-                    index += 1  # escape OD
-
-                    return While(height, condition, program)
-
-                if tokens[index][0] == 'IF':
-                    index += 1  # escape IF
-
-                    condition = parse_expr(height + 1)
-                    index += 1  # escape THEN
-
-                    if_true = parse_ast(height + 1)
-                    index += 1  # escape ELSE
-
-                    if_false = parse_ast(height + 1)
-                    index += 1  # escape FI
-
-                    return If(height, condition, if_true, if_false)
-
-                if tokens[index][0] == 'VARIABLE':
-                    if tokens[index + 1][0] == 'EQUAL':
-                        variable = parse_operand(height + 1)
-                        index += 1
-                        expr = parse_expr(height + 1)
+                    node = build.add_assign(variable, parse_expr())
+                else:
+                    node = parse_expr()
+
+                # hand the node to the statements it completes, up to one that expects another statement
+                while open_statements:
+                    statement, nodes = open_statements[-1]
+                    nodes.append(node)
+
+                    if statement == kind.BEGIN:
+                        if kinds[index] != kind.END:
+                            break
+
+                        index += 1  # escape END
+                        node = build.add_instruction_list(nodes)
+                    elif statement == kind.WHILE:
+                        index += 1  # escape OD
+                        node = build.add_while(*nodes)
+                    else:
+                        index += 1  # escape ELSE / FI
+                        if len(nodes) == 2:
+                            break
+
+                        node = build.add_if(*nodes)
+
+                    open_statements.pop()
+                else:
+                    return node
 
-                        return Assign(height, variable, expr)
+        if not arena:
+            return parse_ast()
 
-                return parse_expr(height + 1)
+        root = parse_ast()
+        if root is not None:  # an empty program keeps the root of an empty Arena
+            build.root = root
 
-        return parse_ast()
+        return build
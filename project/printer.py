@@ -0,0 +1,136 @@
+from typing import IO, Callable, Dict, Iterator, Tuple, Union
+
+from .ast import TAB, Node, InstructionList, Expr, While, If, Assign
+
+EXPR_NAMES = {
+    'v': 'variable',
+    'i': 'integer',
+    '+': 'plus',
+    '-': 'minus',
+    '*': 'multiply',
+    '>': 'greaterthan',
+    '==': 'equals',
+}
+
+# what a visitor yields: a child to print, as (node, depth, whether it is a statement)
+Child = Tuple[Union[Node, str], int, bool]
+
+
+class Printer:
+    """
+        Writes an AST to a file-like object in a single pass, every line written once at its final indentation.
+        Nodes carry no indentation: it is the depth of the node, tracked while walking the tree.
+    """
+
+    # text is gathered in parts and handed to the output once about this many characters are pending
+    BUFFERED_CHARS = 1 << 16
+
+    def __init__(self, out: IO[str]):
+        self.__out = out
+        self.__parts = []
+        self.__visitors: Dict[type, Callable[[Node, int], Iterator[Child]]] = {
+            InstructionList: self.visit_instruction_list,
+            Expr: self.visit_expr,
+            While: self.visit_while,
+            If: self.visit_if,
+            Assign: self.visit_assign,
+        }
+
+    def print(self, ast: Node):
+        """
+            Walks the tree with an explicit stack of the visitors of the nodes being printed, innermost last, so
+            any nesting depth can be printed
+        """
+        parts = self.__parts
+        write = parts.append
+        visitors = self.__visitors
+        stack = [iter([(ast, 0, True)])]
+
+        while stack:
+            # the lines written are about as long as the stack is deep
+            if len(parts) * len(stack) > self.BUFFERED_CHARS:
+                self.flush()
+
+            child = next(stack[-1], None)
+            if child is None:
+                stack.pop()
+                continue
+
+            node, depth, statement = child
+
+            visitor = visitors.get(node.__class__)
+            if visitor is None:
+                # names and values of variables and integers
+                write('prog' if isinstance(node, Node) else str(node))
+                continue
+
+            if node.__class__ is Expr:
+                if statement:
+                    # an expression used as a statement has always been printed one level deeper than its place
+                    # in the tree
+                    depth += 1
+                if node.right is None and node.type in 'iv':
+                    indent = depth * TAB
+                    write('{} [\n{}{}{}\n{}]'.format(EXPR_NAMES[node.type], indent, TAB, node.left, indent))
+                    continue
+
+            stack.append(visitor(node, depth))
+
+        self.flush()
+
+    def flush(self):
+        self.__out.write(''.join(self.__parts))
+        self.__parts.clear()
+
+    # Every visitor writes the text of its node and yields its children in between, as (child, depth, is a
+    # statement): a node writes its header, then a line for each child one tab deeper than itself, then its
+    # closing bracket, and a child writes its first line right after the prefix ('do ', 'then ', ...)
+
+    def visit_instruction_list(self, node: InstructionList, depth: int) -> Iterator[Child]:
+        write = self.__parts.append
+        indent = '\n' + (depth + 1) * TAB
+        write('[')
+        for instruction in node.list:
+            write(indent)
+            yield instruction, depth + 1, True
+        write('\n' + depth * TAB + ']')
+
+    def visit_expr(self, node: Expr, depth: int) -> Iterator[Child]:
+        write = self.__parts.append
+        write(EXPR_NAMES.get(node.type, 'expr') + ' [\n' + (depth + 1) * TAB)
+        yield node.left, depth + 1, False
+        if node.right:
+            write('\n' + (depth + 1) * TAB)
+            yield node.right, depth + 1, False
+        write('\n' + depth * TAB + ']')
+
+    def visit_while(self, node: While, depth: int) -> Iterator[Child]:
+        write = self.__parts.append
+        write('while [\n' + (depth + 1) * TAB)
+        yield node.expr, depth + 1, False
+        write('\n' + (depth + 1) * TAB + 'do ')
+        yield node.prog, depth + 1, True
+        write('\n' + depth * TAB + ']')
+
+    def visit_if(self, node: If, depth: int) -> Iterator[Child]:
+        write = self.__parts.append
+        write('if [\n' + (depth + 1) * TAB)
+        yield node.expr, depth + 1, False
+        write('\n' + (depth + 1) * TAB + 'then ')
+        yield node.then_branch, depth + 1, True
+        write('\n' + (depth + 1) * TAB + 'else ')
+        yield node.else_branch, depth + 1, True
+        write('\n' + depth * TAB + ']')
+
+    def visit_assign(self, node: Assign, depth: int) -> Iterator[Child]:
+        write = self.__parts.append
+        write('assign [\n' + (depth + 1) * TAB)
+        yield node.variable, depth + 1, False
+        write('\n' + (depth + 1) * TAB)
+        yield node.expr, depth + 1, False
+        write('\n' + depth * TAB + ']')
+
+
+def write_ast(ast: Node, out: IO[str]):
+    """writes the printed form of ast (str(ast)) to out, in a single pass over the tree"""
+    Printer(out).print(ast)
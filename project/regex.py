@@ -1,8 +1,8 @@
 from abc import ABC, abstractmethod
 from string import ascii_lowercase
-from typing import Union
+from typing import Union, Tuple
 
-from .nfa import NFA
+from .nfa import NFA, NFABuilder
 from .utils import decode
 
 
@@ -117,8 +117,14 @@ class Regex(ABC):
 
         return helper()
 
-    @abstractmethod
     def to_nfa(self) -> NFA:
+        builder = NFABuilder()
+
+        return builder.to_nfa(self.build(builder))
+
+    @abstractmethod
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        """Adds the states of this regex to builder; @return the (initial_state, final_state) of the fragment"""
         pass
 
 
@@ -127,11 +133,8 @@ class RegexUnion(Regex):
         self.__a = a
         self.__b = b
 
-    def to_nfa(self) -> NFA:
-        nfa_a = self.__a.to_nfa()
-        nfa_b = self.__b.to_nfa()
-
-        return nfa_a.union(nfa_b)
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        return builder.union(self.__a.build(builder), self.__b.build(builder))
 
     def __str__(self):
         return 'UNION ' + str(self.__a) + ' ' + str(self.__b)
@@ -144,11 +147,8 @@ class RegexConcat(Regex):
         self.__a = a
         self.__b = b
 
-    def to_nfa(self) -> NFA:
-        nfa_a = self.__a.to_nfa()
-        nfa_b = self.__b.to_nfa()
-
-        return nfa_a.concat(nfa_b)
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        return builder.concat(self.__a.build(builder), self.__b.build(builder))
 
     def __str__(self):
         return 'CONCAT ' + str(self.__a) + ' ' + str(self.__b)
@@ -160,10 +160,8 @@ class RegexStar(Regex):
     def __init__(self, a: Regex):
         self.__a = a
 
-    def to_nfa(self) -> NFA:
-        nfa = self.__a.to_nfa()
-
-        return nfa.star()
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        return builder.star(self.__a.build(builder))
 
     def __str__(self):
         return 'STAR ' + str(self.__a)
@@ -175,10 +173,8 @@ class RegexPlus(Regex):
     def __init__(self, a: Regex):
         self.__a = a
 
-    def to_nfa(self) -> NFA:
-        nfa = self.__a.to_nfa()
-
-        return nfa.concat(nfa.star())
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        return builder.plus(self.__a.build(builder))
 
     def __str__(self):
         return 'PLUS ' + str(self.__a)
@@ -190,8 +186,8 @@ class RegexChar(Regex):
     def __init__(self, char: str):
         self.__char = char
 
-    def to_nfa(self) -> NFA:
-        return NFA({self.__char}, 0, 1, 2, {0: {self.__char: {1}}})
+    def build(self, builder: NFABuilder) -> Tuple[int, int]:
+        return builder.char(self.__char)
 
     def __str__(self):
         return self.__char
@@ -0,0 +1,126 @@
+from typing import Dict, Iterator, List, Set
+
+from .ast import Assign, Expr, While, InstructionList, If, Node
+
+
+class Unassigned:
+    """Initial value of a variable slot: any use of it raises NameError, like reading an unknown variable."""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def fail(self, *args):
+        raise NameError('name \'{}\' is not defined'.format(self.name))
+
+    __add__ = __radd__ = __sub__ = __rsub__ = __mul__ = __rmul__ = fail
+    __gt__ = __lt__ = __eq__ = __bool__ = fail
+    __hash__ = None
+
+
+class Resolution:
+    """
+        The variables of a program: each one has a fixed slot, numbered in the order the program first mentions
+        them, so a store can be a list indexed by slot instead of a dict keyed by name. The variables come back by
+        name in the order they were first assigned while running, as a dict filled assignment by assignment would
+        have them.
+    """
+
+    def __init__(self):
+        self.slots: Dict[str, int] = {}
+        self.names: List[str] = []  # slot i holds names[i]
+        # variable reads that may run before their variable is assigned; every other read is safe
+        self.maybe_unassigned: Set[Expr] = set()
+        # assignments that may be the first to their variable; every other one stores to an assigned slot
+        self.maybe_first: Set[Assign] = set()
+        self.warnings: List[str] = []
+
+    def slot(self, name: str) -> int:
+        if name not in self.slots:
+            self.slots[name] = len(self.names)
+            self.names.append(name)
+
+        return self.slots[name]
+
+    def new_store(self) -> List:
+        """
+            @return a store with every variable unassigned; its last item, after the slots, is the list of the slots
+            in the order of their first assignment, appended to by the assignments in maybe_first
+        """
+        store: List = [Unassigned(name) for name in self.names]
+        store.append([])
+
+        return store
+
+    def to_dict(self, store: List) -> Dict[str, int]:
+        """@return the assigned variables of store, by name, in the order they were first assigned"""
+        return {self.names[slot]: store[slot] for slot in store[-1]}
+
+
+def resolve(ast: Node) -> Resolution:
+    """
+        Gives every variable of the program a slot and finds, without running it, the reads of variables that
+        are not assigned on every path leading to them. A loop body may run zero times, so what it assigns does
+        not count after the loop; after an if, only what both branches assign does.
+        Bare expressions are never evaluated, so their variables are ignored.
+    """
+    resolution = Resolution()
+    assigned: Set[int] = set()  # slots assigned on every path to the current statement
+    ever_assigned: Set[int] = set()
+    read_unassigned: Set[int] = set()
+
+    def read(expr: Expr):
+        pending = [expr]
+        while pending:
+            expr = pending.pop()
+            if expr.type == 'v':
+                slot = resolution.slot(expr.left)
+                if slot not in assigned:
+                    resolution.maybe_unassigned.add(expr)
+                    read_unassigned.add(slot)
+            elif expr.type != 'i':
+                pending.append(expr.right)
+                pending.append(expr.left)
+
+    def resolve_statement(node: Node) -> Iterator[Node]:
+        """Resolves node around its nested statements, which it yields in order to be resolved."""
+        nonlocal assigned
+
+        if isinstance(node, Assign):
+            slot = resolution.slot(node.variable.left)
+            read(node.expr)
+            if slot not in assigned:
+                resolution.maybe_first.add(node)
+            assigned.add(slot)
+            ever_assigned.add(slot)
+        elif isinstance(node, If):
+            read(node.expr)
+            before = set(assigned)
+            yield node.then_branch
+            after_then, assigned = assigned, before
+            yield node.else_branch
+            assigned &= after_then
+        elif isinstance(node, InstructionList):
+            yield from node.list
+        elif isinstance(node, While):
+            read(node.expr)
+            before = set(assigned)
+            yield node.prog
+            assigned = before
+
+    # the statements being resolved, innermost last, as in vm.assemble
+    statements = [resolve_statement(ast)]
+    while statements:
+        nested = next(statements[-1], None)
+        if nested is None:
+            statements.pop()
+        else:
+            statements.append(resolve_statement(nested))
+
+    for slot in sorted(read_unassigned):
+        name = resolution.names[slot]
+        if slot in ever_assigned:
+            resolution.warnings.append('variable \'{}\' may be used before it is assigned'.format(name))
+        else:
+            resolution.warnings.append('variable \'{}\' is never assigned'.format(name))
+
+    return resolution
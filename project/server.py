@@ -0,0 +1,164 @@
+"""
+    Long-running interpreter service: the lexer is compiled once and programs are executed as they arrive.
+
+    Protocol (JSON lines, over stdin/stdout or a Unix socket): each request is one line,
+        {"id": <any>, "source": "<program text>"} or {"id": <any>, "file": "<program file>"}
+    and gets one response line,
+        {"id": ..., "store": {...}, "steps": n, "parse_time": s, "run_time": s} or {"id": ..., "error": "..."}
+
+    A request whose program runs longer than --timeout gets the error "Timeout: ..." (stdin/stdout only: the
+    socket server runs requests on threads, which can not be interrupted).
+
+    python -m project.server [--lexer lexer.txt] [--vm] [--timeout SECONDS | --socket PATH]
+    python -m project.server client [--socket PATH] <program_file>...
+    python -m project.server loadtest [--requests N] <program_file>...
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import subprocess
+import sys
+from time import perf_counter
+from typing import IO, List
+
+from .interpreter import Interpreter
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Timeout(Exception):
+    pass
+
+
+def handle(interpreter: Interpreter, line: str, timeout: float = 0) -> str:
+    """
+        Executes one request line and returns the response line (without the newline).
+        @param timeout - seconds the program may run before it is stopped, 0 for no limit; main thread only
+    """
+    def alarm(signum, frame):
+        raise Timeout('program exceeded {}s'.format(timeout))
+
+    request_id = None
+    if timeout:
+        signal.signal(signal.SIGALRM, alarm)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError('a request must be a JSON object')
+        request_id = request.get('id')
+        stats = {}
+
+        if 'source' in request:
+            store = interpreter.interpret_source(request['source'], stats)
+        else:
+            store = interpreter.interpret(request['file'], stats)
+
+        return json.dumps(dict(id=request_id, store=store, **stats))
+    except Exception as err:
+        return json.dumps({'id': request_id, 'error': '{}: {}'.format(type(err).__name__, err)})
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def serve(interpreter: Interpreter, requests: IO, responses: IO, timeout: float = 0):
+    for line in requests:
+        if line.strip():
+            responses.write(handle(interpreter, line, timeout) + '\n')
+            responses.flush()
+
+
+def serve_socket(interpreter: Interpreter, path: str):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if line.strip():
+                    self.wfile.write((handle(interpreter, line.decode('utf-8')) + '\n').encode('utf-8'))
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def client(path: str, program_files: List[str]):
+    """Sends the programs to a server listening on a Unix socket and prints the responses."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.connect(path)
+        stream = connection.makefile('rw')
+
+        for i, program_file in enumerate(program_files):
+            stream.write(json.dumps({'id': i, 'file': os.path.abspath(program_file)}) + '\n')
+            stream.flush()
+            print(stream.readline(), end='')
+
+
+def loadtest(program_files: List[str], requests: int, lexer_file: str):
+    """Compares the throughput of one process per program with a single server over a pipe."""
+    programs = [os.path.abspath(program_files[i % len(program_files)]) for i in range(requests)]
+
+    start = perf_counter()
+    for program in programs:
+        subprocess.run([sys.executable, 'CompleteLexer.py', program], cwd=ROOT, check=True,
+                       stdout=subprocess.DEVNULL)
+    per_process = requests / (perf_counter() - start)
+
+    start = perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'project.server', '--lexer', os.path.abspath(lexer_file)],
+                              cwd=ROOT, stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    for i, program in enumerate(programs):
+        server.stdin.write(json.dumps({'id': i, 'file': program}) + '\n')
+        server.stdin.flush()
+        response = json.loads(server.stdout.readline())
+        if 'error' in response:
+            raise Exception('{}: {}'.format(program, response['error']))
+    server.stdin.close()
+    server.wait()
+    served = requests / (perf_counter() - start)
+
+    print('one process per program: {:10.1f} requests/s'.format(per_process))
+    print('server:                  {:10.1f} requests/s ({:.1f}x)'.format(served, served / per_process))
+
+
+def main(argv: List[str]):
+    if argv and argv[0] in ('client', 'loadtest'):
+        parser = argparse.ArgumentParser(prog='python -m project.server ' + argv[0])
+        parser.add_argument('program_files', nargs='+')
+        if argv[0] == 'client':
+            parser.add_argument('--socket', required=True)
+            args = parser.parse_args(argv[1:])
+            client(args.socket, args.program_files)
+        else:
+            parser.add_argument('--requests', type=int, default=100)
+            parser.add_argument('--lexer', default=os.path.join(ROOT, 'lexer.txt'))
+            args = parser.parse_args(argv[1:])
+            loadtest(args.program_files, args.requests, args.lexer)
+        return
+
+    parser = argparse.ArgumentParser(prog='python -m project.server')
+    parser.add_argument('--lexer', default='lexer.txt')
+    parser.add_argument('--vm', action='store_true',
+                        help='run every program on the bytecode VM, not only the deeply nested ones')
+    parser.add_argument('--timeout', type=float, default=0, help='seconds allowed per program')
+    parser.add_argument('--socket', help='listen on this Unix socket instead of stdin/stdout')
+    args = parser.parse_args(argv)
+    if args.socket and args.timeout:
+        parser.error('--timeout only applies to stdin/stdout')
+
+    interpreter = Interpreter(args.lexer, vm=args.vm)
+    if args.socket:
+        serve_socket(interpreter, args.socket)
+    else:
+        serve(interpreter, sys.stdin, sys.stdout, args.timeout)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
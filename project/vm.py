@@ -0,0 +1,231 @@
+from array import array
+from typing import Dict, Iterator, List, Tuple
+
+from .ast import Assign, Expr, While, InstructionList, If, Node
+from .resolver import Resolution, Unassigned, resolve
+
+# The interpreter's fallback for programs nested too deep for the compiled closures (see
+# Interpreter.COMPILE_DEPTH): assembling and running take no Python frames per level of nesting, but
+# dispatching every instruction through one loop makes it slower than the closures on shallow programs.
+#
+# Register machine: every instruction takes four cells in the code array (opcode, x, y, z).
+# Registers hold the variables first, then the constants, then the temporaries.
+MOVE = 0  # r[x] = r[y]
+ADD = 1  # r[x] = r[y] + r[z]
+SUB = 2  # r[x] = r[y] - r[z]
+MUL = 3  # r[x] = r[y] * r[z]
+GT = 4  # r[x] = r[y] > r[z]
+LT = 5  # r[x] = r[y] < r[z]
+EQ = 6  # r[x] = r[y] == r[z]
+JUMP = 7  # pc = x
+JUMP_IF_FALSE = 8  # if not r[y]: pc = x
+JUMP_UNLESS_GT = 9  # if not r[y] > r[z]: pc = x
+JUMP_UNLESS_LT = 10  # if not r[y] < r[z]: pc = x
+JUMP_UNLESS_EQ = 11  # if not r[y] == r[z]: pc = x
+HALT = 12
+FIRST = 13  # if r[x] is unassigned: the assignment to r[x] that follows is its first, record the order
+
+MNEMONICS = ['MOVE', 'ADD', 'SUB', 'MUL', 'GT', 'LT', 'EQ', 'JUMP', 'JUMP_IF_FALSE',
+             'JUMP_UNLESS_GT', 'JUMP_UNLESS_LT', 'JUMP_UNLESS_EQ', 'HALT', 'FIRST']
+BINARY_OPCODES = {'+': ADD, '-': SUB, '*': MUL, '>': GT, '<': LT, '==': EQ}
+BRANCH_OPCODES = {'>': JUMP_UNLESS_GT, '<': JUMP_UNLESS_LT, '==': JUMP_UNLESS_EQ}
+
+
+class Bytecode:
+    def __init__(self, code: array, names: List[str], constants: List[int], registers: int):
+        self.code = code  # flat stream of (opcode, x, y, z) instructions
+        self.names = names  # variable names, register i holds names[i]
+        self.constants = constants  # register len(names) + i holds constants[i]
+        self.registers = registers  # total number of registers, temporaries included
+
+    def __str__(self):
+        return '\n'.join([
+            '{:>4} {} {} {} {}'.format(pc, MNEMONICS[self.code[pc]], *self.code[pc + 1:pc + 4])
+            for pc in range(0, len(self.code), 4)
+        ])
+
+
+def assemble(ast: Node, resolution: Resolution = None) -> Bytecode:
+    """
+        Translates an AST into a flat register-machine instruction stream.
+        @param resolution - the variable slots of ast (resolved here if not given): variable registers are slots
+    """
+    if resolution is None:
+        resolution = resolve(ast)
+    slots = resolution.slots
+    constants: Dict[int, int] = {}
+    instructions: List[tuple] = []
+    temporaries = 0
+
+    # Registers are numbered only once every variable and constant is known, so the first pass
+    # refers to them symbolically: ('v', slot), ('c', index) or ('t', depth); jump targets are ('p', instruction)
+    def variable(name: str) -> Tuple[str, int]:
+        return 'v', slots[name]
+
+    def constant(value: int) -> Tuple[str, int]:
+        if value not in constants:
+            constants[value] = len(constants)
+
+        return 'c', constants[value]
+
+    def emit(opcode: int, x=0, y=0, z=0) -> int:
+        instructions.append((opcode, x, y, z))
+
+        return len(instructions) - 1
+
+    def assemble_expr(expr: Expr, depth: int = 0, target=None):
+        """
+            Emits the code computing expr and returns the register holding its value. Operands are walked with an
+            explicit stack, left before right, so long operator chains take no Python stack.
+        """
+        nonlocal temporaries
+
+        # (expr, depth, target, whether its operands are already computed)
+        pending = [(expr, depth, target, False)]
+        values = []
+        while pending:
+            expr, depth, target, ready = pending.pop()
+            if expr.type == 'i':
+                values.append(constant(int(expr.left)))
+            elif expr.type == 'v':
+                values.append(variable(expr.left))
+            elif not ready:
+                pending.append((expr, depth, target, True))
+                pending.append((expr.right, depth + 1, None, False))
+                pending.append((expr.left, depth, None, False))
+            else:
+                right = values.pop()
+                left = values.pop()
+                temporaries = max(temporaries, depth + 1)
+                target = target or ('t', depth)
+                emit(BINARY_OPCODES[expr.type], target, left, right)
+                values.append(target)
+
+        return values[0]
+
+    def assemble_condition(expr: Expr) -> int:
+        """Emits a conditional jump taken when expr is false and returns its index for back-patching."""
+        if expr.type in BRANCH_OPCODES:
+            left = assemble_expr(expr.left, 0)
+            right = assemble_expr(expr.right, 1)
+
+            return emit(BRANCH_OPCODES[expr.type], None, left, right)
+
+        return emit(JUMP_IF_FALSE, None, assemble_expr(expr))
+
+    def patch(index: int):
+        instructions[index] = (instructions[index][0], ('p', len(instructions))) + instructions[index][2:]
+
+    def assemble_statement(node: Node) -> Iterator[Node]:
+        """Emits the code of node around its nested statements, which it yields in order to be assembled."""
+        if isinstance(node, Assign):
+            target = variable(node.variable.left)
+            if node in resolution.maybe_first:
+                emit(FIRST, target)
+            if node.expr.type in 'iv':
+                emit(MOVE, target, assemble_expr(node.expr))
+            else:
+                assemble_expr(node.expr, target=target)
+        elif isinstance(node, If):
+            to_else = assemble_condition(node.expr)
+            yield node.then_branch
+            to_end = emit(JUMP)
+            patch(to_else)
+            yield node.else_branch
+            patch(to_end)
+        elif isinstance(node, InstructionList):
+            yield from node.list
+        elif isinstance(node, While):
+            start = len(instructions)
+            to_end = assemble_condition(node.expr)
+            yield node.prog
+            emit(JUMP, ('p', start))
+            patch(to_end)
+
+    # the statements being assembled, innermost last: nesting depth is bounded by memory, not the Python stack
+    statements = [assemble_statement(ast)]
+    while statements:
+        nested = next(statements[-1], None)
+        if nested is None:
+            statements.pop()
+        else:
+            statements.append(assemble_statement(nested))
+    emit(HALT)
+
+    base = {'v': 0, 'c': len(slots), 't': len(slots) + len(constants), 'p': 0}
+    scale = {'v': 1, 'c': 1, 't': 1, 'p': 4}  # jump targets become positions in the code array
+    code = array('l')
+    for instruction in instructions:
+        code.extend([instruction[0]] + [
+            base[arg[0]] + arg[1] * scale[arg[0]] if arg else 0 for arg in instruction[1:]
+        ])
+
+    return Bytecode(code, list(resolution.names), list(constants), len(slots) + len(constants) + temporaries)
+
+
+def execute(bytecode: Bytecode, steps: List[int] = None) -> Dict[str, int]:
+    """
+        Runs the bytecode and returns the final store, its variables in the order they were first assigned.
+        @param steps - if given, steps[0] is increased by the number of instructions executed
+    """
+    code = bytecode.code
+    names = bytecode.names
+    registers: List = [Unassigned(name) for name in names]
+    registers.extend(bytecode.constants)
+    registers.extend([0] * (bytecode.registers - len(registers)))
+    first_assigned = []  # variable registers in the order of their first assignment
+    pc = 0
+    executed = 0
+
+    while True:
+        opcode = code[pc]
+        executed += 1
+
+        if opcode == ADD:
+            registers[code[pc + 1]] = registers[code[pc + 2]] + registers[code[pc + 3]]
+        elif opcode == SUB:
+            registers[code[pc + 1]] = registers[code[pc + 2]] - registers[code[pc + 3]]
+        elif opcode == MUL:
+            registers[code[pc + 1]] = registers[code[pc + 2]] * registers[code[pc + 3]]
+        elif opcode == JUMP_UNLESS_GT:
+            if not registers[code[pc + 2]] > registers[code[pc + 3]]:
+                pc = code[pc + 1]
+                continue
+        elif opcode == JUMP:
+            pc = code[pc + 1]
+            continue
+        elif opcode == MOVE:
+            value = registers[code[pc + 2]]
+            if value.__class__ is Unassigned:
+                value.fail()
+            registers[code[pc + 1]] = value
+        elif opcode == JUMP_UNLESS_LT:
+            if not registers[code[pc + 2]] < registers[code[pc + 3]]:
+                pc = code[pc + 1]
+                continue
+        elif opcode == JUMP_UNLESS_EQ:
+            if not registers[code[pc + 2]] == registers[code[pc + 3]]:
+                pc = code[pc + 1]
+                continue
+        elif opcode == JUMP_IF_FALSE:
+            if not registers[code[pc + 2]]:
+                pc = code[pc + 1]
+                continue
+        elif opcode == GT:
+            registers[code[pc + 1]] = registers[code[pc + 2]] > registers[code[pc + 3]]
+        elif opcode == LT:
+            registers[code[pc + 1]] = registers[code[pc + 2]] < registers[code[pc + 3]]
+        elif opcode == EQ:
+            registers[code[pc + 1]] = registers[code[pc + 2]] == registers[code[pc + 3]]
+        elif opcode == FIRST:
+            if registers[code[pc + 1]].__class__ is Unassigned:
+                first_assigned.append(code[pc + 1])
+        elif opcode == HALT:
+            break
+
+        pc += 4
+
+    if steps is not None:
+        steps[0] += executed
+
+    return {names[i]: registers[i] for i in first_assigned}